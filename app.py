@@ -4,23 +4,11 @@ import re
 import numpy as np
 import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
 from functions_app import *
 from import_data import calculate_kpis
 from charts import *
-
-# Cargo category dropdown mapping: label → column prefix
-CARGO_CATEGORIES = {
-    "Totaal": None,
-    "Perishables": "Perishables",
-    "Fashion & textiel": "Fashion_en_textiel",
-    "Machines & elektronica": "Machines_en_elektronica",
-    "Transport": "Transport",
-    "Pharma": "Pharma",
-    "Industrie & materialen": "Industrie_en_materialen",
-    "Low value bulk": "Low_value_bulk",
-    "Overig": "Overig",
-}
+from cargo_engine import CARGO_CATEGORIES, CargoSelection  # cargo category dropdown: label → column prefix
+import timing
 
 st.set_page_config(page_title="Airport Scenario Explorer", layout="wide")
 ss = st.session_state
@@ -29,7 +17,13 @@ ss = st.session_state
 # App
 # -----------------------------
 
-ensure_defaults()
+# Timing spans of this rerun: JSON lines (MAINPORT_TIMING_LOG) and the ?debug=timings panel
+timing_run = begin_timing()
+# ?debug=profile / ?debug=pstats: profile this rerun, offered as a download at the end
+profiler = begin_profile(__file__)
+
+with timing.span("ensure_defaults"):
+    ensure_defaults()
 css()
 
 # Sidebar
@@ -141,40 +135,20 @@ with left:
         placeholder="Scenario title",
     )
 
-    outputs = calculate_kpis(
-        slots=int(st.session_state.slots),
-        freight_pct=float(st.session_state.freight_share),
-        short_pct=int(st.session_state.ui_short),
-        medium_pct=int(st.session_state.ui_medium),
-        long_pct=int(st.session_state.ui_long),
-    )
-
-    # Store current outputs for pinning; initialise baseline on first run
-    ss.current_outputs = {k: v for k, v in outputs.items() if k != 'seg'}
     if ss.pinned_kpis is None:
-        # Compute baseline with DEFAULT values so that shared URLs with
-        # e.g. ?slots=500000 still show delta vs the starting situation.
-        # Uses the same constants as reset_all() and ensure_defaults().
-        default_haul = scenario_defaults(DEFAULT_PATH, DEFAULT_SLOTS, DEFAULT_FREIGHT_SHARE)
-        # Temporarily swap in default runway shares for baseline noise computation
-        saved_runway = ss.runway_shares
-        ss.runway_shares = default_runway_shares()
-        baseline_outputs = calculate_kpis(
-            slots=DEFAULT_SLOTS,
-            freight_pct=DEFAULT_FREIGHT_SHARE,
-            short_pct=default_haul["short"],
-            medium_pct=default_haul["medium"],
-            long_pct=default_haul["long"],
-        )
-        ss.runway_shares = saved_runway  # restore user's runway shares
-        baseline_out = {k: v for k, v in baseline_outputs.items() if k != 'seg'}
+        # Baseline with DEFAULT values so that shared URLs with e.g. ?slots=500000
+        # still show delta vs the starting situation. It only depends on the
+        # DEFAULT_* constants and the data, so it is computed once per process.
+        with timing.span("baseline"):
+            baseline = baseline_outputs()
+        baseline_out = {k: v for k, v in baseline.items() if k not in ('seg', 'exposure', 'levels', 'diff')}
         ss.pinned_kpis = dict(baseline_out)
         ss.baseline_kpis = dict(baseline_out)
         ss.pinned_label = "Starting situation"
-        # Store baseline noise scenario for unpin
-        ss.pinned_noise = ss.noise_gdf['scenario'].copy()
-        ss.baseline_noise = ss.noise_gdf['scenario'].copy()
-        # Re-run calculate_kpis with actual inputs to restore current scenario state
+        # Baseline noise scenario (read-only, shared) as diff reference
+        ss.noise.pin(baseline['levels'])
+
+    with timing.span("calculate_kpis"):
         outputs = calculate_kpis(
             slots=int(st.session_state.slots),
             freight_pct=float(st.session_state.freight_share),
@@ -182,23 +156,29 @@ with left:
             medium_pct=int(st.session_state.ui_medium),
             long_pct=int(st.session_state.ui_long),
         )
-        ss.current_outputs = {k: v for k, v in outputs.items() if k != 'seg'}
+
+    # Store current outputs for pinning
+    ss.current_outputs = {k: v for k, v in outputs.items() if k not in ('seg', 'exposure')}
     if "baseline_kpis" not in ss:
         ss.baseline_kpis = dict(ss.current_outputs)
-    if "pinned_noise" not in ss:
-        ss.pinned_noise = ss.noise_gdf['normal'].copy()
-        ss.baseline_noise = ss.noise_gdf['normal'].copy()
 
     ref = ss.pinned_kpis  # reference for delta computation
 
     #fig_em_over = emissions_overview_fig(seg)
-    fig_pax = pax_hist_fig(outputs['seg'])
-    cargo_pax = cargo_hist_fig(outputs['seg']) 
-
-    #fig_noise = noise_choropleth_fig(ss.noise_gdf, color_col="diff") 
-    fig_hist = noise_hist_fig(ss.noise_gdf)
-    fig_val = value_fig(outputs['seg'])
-    fig_emp = employment_fig(outputs['seg'])
+    with timing.span("chart pax"):
+        fig_pax = pax_hist_fig(outputs['seg'])
+    with timing.span("chart cargo"):
+        cargo_pax = cargo_hist_fig(outputs['seg'])
+
+    # Scenario / diff columns on the shared noise layer for the charts of this run
+    noise_gdf = ss.noise.frame()
+    #fig_noise = noise_choropleth_fig(noise_gdf, color_col="diff") 
+    with timing.span("chart noise histogram"):
+        fig_hist = noise_hist_fig(noise_gdf, weight_by_population=ss.get('ui_hist_population', False))
+    with timing.span("chart value"):
+        fig_val = value_fig(outputs['seg'])
+    with timing.span("chart employment"):
+        fig_emp = employment_fig(outputs['seg'])
 
     # KPI cards in compact grid with coloured left borders per category
     # Order: General → Strategic Autonomy → Economy → Environment
@@ -283,35 +263,54 @@ with left:
     c1, c2, c3 = st.columns([1.2, 1.2, 1.2], gap="small")
 
     with c1:
-        st.plotly_chart(fig_pax, width='stretch')
+        timed_plotly_chart("pax", fig_pax, width='stretch')
 
     with c2:
-        st.plotly_chart(cargo_pax, width='stretch')
+        timed_plotly_chart("cargo", cargo_pax, width='stretch')
 
     with c3:
-        st.plotly_chart(fig_hist, width='stretch')
+        timed_plotly_chart("noise histogram", fig_hist, width='stretch')
+        st.toggle("Weight by population", key="ui_hist_population")
 
     # Tabs with extra graphs
     tab1, tab2, tab3, tab4 = st.tabs(["Noise map (Lden)", "Added value", "Employment", "Cargo flows"])
 
     with tab1:
-        st.radio(
-            "Color by",
-            options=["diff", "Lden"],
-            key='ui_sound'
-        )
-        st.plotly_chart(noise_choropleth_fig(ss.noise_gdf, color_col=ss.ui_sound), width='stretch')
+        col_color, col_mode = st.columns(2)
+        with col_color:
+            st.radio(
+                "Color by",
+                options=["diff", "Lden"],
+                key='ui_sound'
+            )
+        with col_mode:
+            st.radio(
+                "Render as",
+                options=["Polygons", "Raster"],
+                key='ui_map_mode',
+                help="Raster draws the noise field as an image overlay; faster for large grids, no hover.",
+            )
+        with timing.span("chart noise map", mode=ss.ui_map_mode):
+            if ss.ui_map_mode == "Raster":
+                fig_noise = noise_raster_fig(noise_gdf, color_col=ss.ui_sound)
+            else:
+                fig_noise = noise_choropleth_fig(noise_gdf, color_col=ss.ui_sound)
+        # for polygons this is mostly the GeoJSON serialisation
+        timed_plotly_chart("noise map", fig_noise, width='stretch')
+        with timing.span("chart exposure"):
+            fig_exposure = exposure_curve_fig(outputs['exposure'])
+        timed_plotly_chart("exposure", fig_exposure, width='stretch')
 
     with tab2:
-        st.plotly_chart(fig_val, width='stretch')
+        timed_plotly_chart("value", fig_val, width='stretch')
 
     with tab3:
-        st.plotly_chart(fig_emp, width='stretch')
+        timed_plotly_chart("employment", fig_emp, width='stretch')
     
     with tab4:
-        # Initialise excluded-country set in session state
-        if 'wgi_excluded' not in ss:
-            ss.wgi_excluded = set()
+        # Initialise excluded countries (mask + running totals) in session state
+        if 'cargo_selection' not in ss:
+            ss.cargo_selection = CargoSelection(get_cargo_engine())
 
         # Category descriptions for tooltips
         CARGO_CAT_DESCRIPTIONS = {
@@ -327,9 +326,8 @@ with left:
         }
 
         @st.fragment
+        @timed_run("cargo fragment")
         def cargo_fragment():
-            df = ss.cargo_data
-
             col_dd, col_reset = st.columns([3, 1])
             with col_dd:
                 selected_cat = st.selectbox(
@@ -341,86 +339,25 @@ with left:
             with col_reset:
                 st.markdown("<div style='height: 1.7rem;'></div>", unsafe_allow_html=True)
                 if st.button("Reset country selection", key="wgi_reset"):
-                    ss.wgi_excluded = set()
+                    ss.cargo_selection.reset()
                     st.rerun(scope="fragment")
 
-            cat_prefix = CARGO_CATEGORIES[selected_cat]
+            cargo = get_cargo_engine()
+            k = cargo.category(selected_cat)
 
             # Scale freight and belly independently based on slots and freight share
-            # Base data assumes DEFAULT_FREIGHT_SHARE (5%) at 478k slots
-            freight_pct = float(ss.freight_share)
-            base_freight_slots = 478_000 * DEFAULT_FREIGHT_SHARE / 100
-            base_belly_slots = 478_000 * (100 - DEFAULT_FREIGHT_SHARE) / 100
-            new_freight_slots = int(ss.slots) * freight_pct / 100
-            new_belly_slots = int(ss.slots) * (100 - freight_pct) / 100
-            freight_scale = new_freight_slots / base_freight_slots if base_freight_slots > 0 else 1
-            belly_scale = new_belly_slots / base_belly_slots if base_belly_slots > 0 else 1
-
-            scaled = df.copy()
-            # Scale freight flights and cargo
-            for c in ['Arrivals full-freight', 'Departures full-freight',
-                       'Cargo-in full freight (tons)', 'Cargo-out full freight (tons)']:
-                scaled[c] = scaled[c] * freight_scale
-            # Scale belly/passenger flights and cargo
-            for c in ['Arrivals belly', 'Departures belly',
-                       'Cargo-in belly (tons)', 'Cargo-out belly (tons)']:
-                scaled[c] = scaled[c] * belly_scale
-            # Total flights = freight + belly
-            scaled['Arrivals total'] = scaled['Arrivals full-freight'] + scaled['Arrivals belly']
-            scaled['Departures total'] = scaled['Departures full-freight'] + scaled['Departures belly']
-
-            # Apply category fraction if a specific category is selected
-            if cat_prefix is not None:
-                frac_in = scaled[f'{cat_prefix}_fraction_in']
-                frac_out = scaled[f'{cat_prefix}_fraction_out']
-                scaled['Cargo-in full freight (tons)'] = scaled['Cargo-in full freight (tons)'] * frac_in
-                scaled['Cargo-out full freight (tons)'] = scaled['Cargo-out full freight (tons)'] * frac_out
-                scaled['Cargo-in belly (tons)'] = scaled['Cargo-in belly (tons)'] * frac_in
-                scaled['Cargo-out belly (tons)'] = scaled['Cargo-out belly (tons)'] * frac_out
-
-            scaled['cargo_in'] = scaled['Cargo-in full freight (tons)'] + scaled['Cargo-in belly (tons)']
-            scaled['cargo_out'] = scaled['Cargo-out full freight (tons)'] + scaled['Cargo-out belly (tons)']
-
-            # Compute euro value columns (tons × eur_per_ton per country)
-            if cat_prefix is not None:
-                eur_per_ton_in = df[f'{cat_prefix}_eur_per_ton_in']
-                eur_per_ton_out = df[f'{cat_prefix}_eur_per_ton_out']
-            else:
-                # Totaal: weighted eur/ton = sum(fraction_i * eur_per_ton_i)
-                all_prefixes = [v for v in CARGO_CATEGORIES.values() if v is not None]
-                eur_per_ton_in = sum(
-                    df[f'{p}_fraction_in'] * df[f'{p}_eur_per_ton_in'] for p in all_prefixes
-                )
-                eur_per_ton_out = sum(
-                    df[f'{p}_fraction_out'] * df[f'{p}_eur_per_ton_out'] for p in all_prefixes
-                )
-            scaled['eur_freight_in'] = scaled['Cargo-in full freight (tons)'] * eur_per_ton_in
-            scaled['eur_freight_out'] = scaled['Cargo-out full freight (tons)'] * eur_per_ton_out
-            scaled['eur_belly_in'] = scaled['Cargo-in belly (tons)'] * eur_per_ton_in
-            scaled['eur_belly_out'] = scaled['Cargo-out belly (tons)'] * eur_per_ton_out
-
-            # Split into active and excluded dataframes
-            active = scaled[~scaled['country'].isin(ss.wgi_excluded)].reset_index(drop=True)
-            excluded_df = scaled[scaled['country'].isin(ss.wgi_excluded)].reset_index(drop=True)
+            # (tensors hold the base data: BASE_FREIGHT_SHARE at 478k slots)
+            scale = cargo.scale(ss.slots, float(ss.freight_share))
+            selection = ss.cargo_selection
 
             # Excluded flights are removed (not redistributed)
             # Compute available slots freed by excluded countries
-            total_movements = scaled['Arrivals total'].sum() + scaled['Departures total'].sum()
-            excluded_movements = excluded_df['Arrivals total'].sum() + excluded_df['Departures total'].sum() if len(excluded_df) > 0 else 0
-            available_slots = int(round(excluded_movements / 2))
-
-            if len(active) > 0:
-                adj_freight_in = active['Cargo-in full freight (tons)'].sum()
-                adj_freight_out = active['Cargo-out full freight (tons)'].sum()
-                adj_belly_in = active['Cargo-in belly (tons)'].sum()
-                adj_belly_out = active['Cargo-out belly (tons)'].sum()
-                adj_eur_freight_in = active['eur_freight_in'].sum()
-                adj_eur_freight_out = active['eur_freight_out'].sum()
-                adj_eur_belly_in = active['eur_belly_in'].sum()
-                adj_eur_belly_out = active['eur_belly_out'].sum()
-            else:
-                adj_freight_in = adj_freight_out = adj_belly_in = adj_belly_out = 0
-                adj_eur_freight_in = adj_eur_freight_out = adj_eur_belly_in = adj_eur_belly_out = 0
+            available_slots = int(round(selection.excluded_movements(scale) / 2))
+
+            # Active totals are kept up to date per toggle: tons / € as (in/out, freight/belly)
+            tons, eur = selection.totals(k, scale)
+            (adj_freight_in, adj_belly_in), (adj_freight_out, adj_belly_out) = tons
+            (adj_eur_freight_in, adj_eur_belly_in), (adj_eur_freight_out, adj_eur_belly_out) = eur
 
             # Store cargo KPIs in current_outputs so pin/unpin works
             ss.current_outputs['cargo_freight_in'] = adj_freight_in
@@ -428,47 +365,16 @@ with left:
             ss.current_outputs['cargo_belly_in'] = adj_belly_in
             ss.current_outputs['cargo_belly_out'] = adj_belly_out
 
-            # Compute reference dynamically using pinned slots/freight_share
-            ref_slots = int(ss.get('pinned_slots', DEFAULT_SLOTS))
-            ref_freight_pct = float(ss.get('pinned_freight_share', DEFAULT_FREIGHT_SHARE))
-            ref_freight_scale = (ref_slots * ref_freight_pct / 100) / (478_000 * DEFAULT_FREIGHT_SHARE / 100)
-            ref_belly_scale = (ref_slots * (100 - ref_freight_pct) / 100) / (478_000 * (100 - DEFAULT_FREIGHT_SHARE) / 100)
-
-            if cat_prefix is not None:
-                frac_in_ref = df[f'{cat_prefix}_fraction_in']
-                frac_out_ref = df[f'{cat_prefix}_fraction_out']
-                eur_in_ref = df[f'{cat_prefix}_eur_per_ton_in']
-                eur_out_ref = df[f'{cat_prefix}_eur_per_ton_out']
-                ref_fi = df['Cargo-in full freight (tons)'] * frac_in_ref * ref_freight_scale
-                ref_fo = df['Cargo-out full freight (tons)'] * frac_out_ref * ref_freight_scale
-                ref_bi = df['Cargo-in belly (tons)'] * frac_in_ref * ref_belly_scale
-                ref_bo = df['Cargo-out belly (tons)'] * frac_out_ref * ref_belly_scale
-            else:
-                all_prefixes = [v for v in CARGO_CATEGORIES.values() if v is not None]
-                eur_in_ref = sum(df[f'{p}_fraction_in'] * df[f'{p}_eur_per_ton_in'] for p in all_prefixes)
-                eur_out_ref = sum(df[f'{p}_fraction_out'] * df[f'{p}_eur_per_ton_out'] for p in all_prefixes)
-                ref_fi = df['Cargo-in full freight (tons)'] * ref_freight_scale
-                ref_fo = df['Cargo-out full freight (tons)'] * ref_freight_scale
-                ref_bi = df['Cargo-in belly (tons)'] * ref_belly_scale
-                ref_bo = df['Cargo-out belly (tons)'] * ref_belly_scale
-
-            cat_ref = {
-                'cargo_freight_in': ref_fi.sum(),
-                'cargo_freight_out': ref_fo.sum(),
-                'cargo_belly_in': ref_bi.sum(),
-                'cargo_belly_out': ref_bo.sum(),
-                'eur_freight_in': (ref_fi * eur_in_ref).sum(),
-                'eur_freight_out': (ref_fo * eur_out_ref).sum(),
-                'eur_belly_in': (ref_bi * eur_in_ref).sum(),
-                'eur_belly_out': (ref_bo * eur_out_ref).sum(),
-            }
+            # Category references (all countries) at the pinned slots/freight share; computed
+            # for all categories at once per pin and cached, so a category switch is a lookup
+            cat_ref = cargo.references(int(ss.get('pinned_slots', DEFAULT_SLOTS)),
+                                       float(ss.get('pinned_freight_share', DEFAULT_FREIGHT_SHARE)))[k]
             cat_label = selected_cat
 
             # Network quality KPI based on active countries
             # Use fraction of OAG cargo retained (active/total) applied to model cargo
             # This guarantees exact match with main page when no countries are excluded
-            total_oag_freight = scaled['Cargo-in full freight (tons)'].sum() + scaled['Cargo-out full freight (tons)'].sum()
-            total_oag_belly = scaled['Cargo-in belly (tons)'].sum() + scaled['Cargo-out belly (tons)'].sum()
+            total_oag_freight, total_oag_belly = cargo.totals(k, scale)[0].sum(axis=0)
             frac_freight = (adj_freight_in + adj_freight_out) / total_oag_freight if total_oag_freight > 0 else 1.0
             frac_belly = (adj_belly_in + adj_belly_out) / total_oag_belly if total_oag_belly > 0 else 1.0
             # Model cargo from calculate_kpis (M tons)
@@ -499,7 +405,7 @@ with left:
                     kpi_card(
                         "Available slots",
                         f"{available_slots:,}",
-                        sub=f"from {len(ss.wgi_excluded)} excluded countries",
+                        sub=f"from {len(selection)} excluded countries",
                         tooltip="Flight movements freed up by excluding countries. These slots are available for reallocation.",
                         category="strategic"
                     )
@@ -576,69 +482,23 @@ with left:
                     category="strategic"
                 )
 
-            # Build figure: colour by total cargo (in + out)
-            fig = go.Figure()
-
-            # Helper: build customdata and hovertemplate for a dataframe
-            def _cargo_customdata(d):
-                nan = float('nan')
-                avg_freight_in = (d['Cargo-in full freight (tons)'] / d['Arrivals full-freight'].replace(0, nan)).fillna(0)
-                avg_freight_out = (d['Cargo-out full freight (tons)'] / d['Departures full-freight'].replace(0, nan)).fillna(0)
-                avg_belly_in = (d['Cargo-in belly (tons)'] / d['Arrivals belly'].replace(0, nan)).fillna(0)
-                avg_belly_out = (d['Cargo-out belly (tons)'] / d['Departures belly'].replace(0, nan)).fillna(0)
-                return np.column_stack([
-                    d['Arrivals full-freight'], d['Departures full-freight'],
-                    d['Cargo-in full freight (tons)'], d['Cargo-out full freight (tons)'],
-                    avg_freight_in, avg_freight_out,
-                    d['Arrivals belly'], d['Departures belly'],
-                    d['Cargo-in belly (tons)'], d['Cargo-out belly (tons)'],
-                    avg_belly_in, avg_belly_out,
-                ])
-
-            _hover = (
-                '%{text}<br>'
-                '<b>Freight</b>  Arr: %{customdata[0]:,.0f} · Dep: %{customdata[1]:,.0f}<br>'
-                '  Capacity in: %{customdata[2]:,.0f} t · out: %{customdata[3]:,.0f} t<br>'
-                '  Avg/flight in: %{customdata[4]:,.1f} t · out: %{customdata[5]:,.1f} t<br>'
-                '<b>Belly</b>  Arr: %{customdata[6]:,.0f} · Dep: %{customdata[7]:,.0f}<br>'
-                '  Capacity in: %{customdata[8]:,.0f} t · out: %{customdata[9]:,.0f} t<br>'
-                '  Avg/flight in: %{customdata[10]:,.1f} t · out: %{customdata[11]:,.1f} t'
-                '<extra></extra>'
-            )
-
-            # Trace 0: active countries
-            active_total_cargo = active['cargo_in'] + active['cargo_out']
-            fig.add_trace(go.Choropleth(
-                locations=active['iso3'],
-                z=active_total_cargo,
-                text=active['country'],
-                customdata=_cargo_customdata(active),
-                colorscale="YlOrRd",
-                hovertemplate=_hover,
-                colorbar=dict(title="Cargo capacity (tons)"),
-                marker_line_width=0.5,
-            ))
-
-            # Trace 1: excluded countries (grey)
-            if len(excluded_df) > 0:
-                excluded_total_cargo = excluded_df['cargo_in'] + excluded_df['cargo_out']
-                fig.add_trace(go.Choropleth(
-                    locations=excluded_df['iso3'],
-                    z=excluded_total_cargo,
-                    text=excluded_df['country'],
-                    customdata=_cargo_customdata(excluded_df),
-                    colorscale=[[0, '#d3d3d3'], [1, '#d3d3d3']],
-                    hovertemplate=_hover.replace('%{text}', '%{text} (excluded)'),
-                    showscale=False,
-                    marker_line_width=0.5,
-                ))
-
-            fig.update_layout(
-                height=600, margin=dict(l=10, r=10, t=30, b=10),
-                geo=dict(projection_type="natural earth"),
-            )
-
-            event = st.plotly_chart(fig, on_select="rerun", key="wgi_chart", selection_mode=["points"])
+            # Map: colour by total cargo (in + out). The figure is kept per session and only
+            # rebuilt when category or scale change; exclusions just move z between its traces.
+            view = (k, tuple(scale))
+            if ss.get('cargo_fig_view') != view:
+                country_tons = cargo.country_tons(k, scale)
+                country_moves = cargo.country_movements(scale)
+                avg = np.divide(country_tons, country_moves, out=np.zeros_like(country_tons), where=country_moves != 0)
+                # per flow: arrivals, departures, capacity in/out, avg per flight in/out
+                customdata = np.column_stack([a[:, d, f] for f in range(2) for a in (country_moves, country_tons, avg) for d in range(2)])
+                with timing.span("chart cargo map"):
+                    ss.cargo_fig = cargo_map_fig(cargo.iso3, cargo.countries, customdata)
+                ss.cargo_fig_total = country_tons.sum(axis=(1, 2))
+                ss.cargo_fig_view = view
+            fig = ss.cargo_fig
+            set_cargo_map_z(fig, ss.cargo_fig_total, selection.excluded)
+
+            event = timed_plotly_chart("cargo map", fig, on_select="rerun", key="wgi_chart", selection_mode=["points"])
 
             # Process map clicks: toggle countries between active ↔ excluded
             if event and event.selection and len(event.selection.points) > 0:
@@ -646,11 +506,9 @@ with left:
                 for point in event.selection.points:
                     curve = point.get("curve_number", point.get("curveNumber", 0))
                     idx = point.get("point_number", point.get("pointNumber", point.get("pointIndex", 0)))
-                    if curve == 0 and idx < len(active):
-                        ss.wgi_excluded.add(active.iloc[idx]['country'])
-                        changed = True
-                    elif curve == 1 and idx < len(excluded_df):
-                        ss.wgi_excluded.discard(excluded_df.iloc[idx]['country'])
+                    # both traces span all countries, so the point index is the country row
+                    if idx < len(selection.excluded) and selection.excluded[idx] == (curve == 1):
+                        selection.toggle(idx)
                         changed = True
                 if changed:
                     st.rerun(scope="fragment")
@@ -678,3 +536,8 @@ with right:
 
     st.markdown("")
     st.button("Share", disabled=True)
+
+profile_downloads(profiler)
+if debug_enabled("timings"):
+    timings_panel(timing_run)
+timing.end()
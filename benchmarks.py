@@ -0,0 +1,242 @@
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from noise_engine import LDEN_COLS
+from datasets import compile_pyramid
+from synthetic import CARGO_FILE, NOISE_FILE, synthetic_data_dir
+
+RESULTS_DIR = "bench_results"
+SCALES = (1, 10, 100)
+
+
+# -----------------------------
+# Scaled data sets
+# -----------------------------
+
+def scaled_data_dir(factor, root, source="data", seed=0):
+    """
+    Synthetic data directory under `root` with `factor` × the cells and cargo origins of
+    `source`, cells with as many points on average as there (see synthetic.py).
+    """
+    noise = gpd.read_feather(os.path.join(source, NOISE_FILE))
+    cargo = pd.read_csv(os.path.join(source, CARGO_FILE), usecols=["country", "iso3"])
+    vertices = int(round(shapely.get_num_coordinates(noise.geometry.values).mean()))
+    path = synthetic_data_dir(os.path.join(root, f"x{factor}"), len(noise) * factor, len(cargo) * factor,
+                              seed=seed, vertices=vertices, params_from=source, countries=cargo)
+    # compiled up front, as on a deployment (python datasets.py compile)
+    compile_pyramid(path)
+    return path
+
+
+# -----------------------------
+# Measurement
+# -----------------------------
+
+def measure(fn, repeat=5):
+    """Best and median wall time (ms) over `repeat` calls, then peak traced allocation (MB) of one call."""
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return dict(best_ms=1000 * min(times), median_ms=1000 * float(np.median(times)), peak_mb=peak / 1e6)
+
+
+def _reset_session():
+    import streamlit as st
+    for k in list(st.session_state.keys()):
+        del st.session_state[k]
+
+
+def _cold_reset():
+    """Forget everything loaded or cached per process, as in a fresh server."""
+    import charts
+    import datasets
+    import model
+    datasets.get_datasets.cache_clear()
+    for f in (model.get_noise_engine, model.get_kpi_engine, model.get_cargo_engine,
+              model.get_result_cache, model.get_baseline):
+        f.cache_clear()
+    charts._GEOJSON_CACHE.clear()
+    _reset_session()
+
+
+def run_cases(repeat=5):
+    """
+    All benchmark cases on the data set MAINPORT_DATA_DIR points at. Runs headless: Streamlit
+    session state works without a script run context, so the app functions are called as is.
+    """
+    import streamlit as st
+    import charts
+    import model
+    from cargo_engine import CargoSelection
+    from datasets import get_datasets
+    from functions_app import ensure_defaults, get_cargo_engine
+    from import_data import calculate_kpis
+
+    ss = st.session_state
+    results = {}
+
+    def case(name, fn, n=repeat):
+        results[name] = measure(fn, n)
+
+    # Cold start first, before anything is loaded in this process
+    def cold():
+        _cold_reset()
+        ensure_defaults()
+    case("ensure_defaults (cold start)", cold, n=1)
+
+    ds = get_datasets()
+    ensure_defaults()
+    weights = np.asarray(list(ss.runway_shares.values()))
+    case("combine_lden_df_weighted", lambda: model.combine_lden_df_weighted(ds.noise_gdf, LDEN_COLS, weights, 478_000))
+    case("combine_lden_df_weighted (energy)",
+         lambda: model.combine_lden_df_weighted(ds.noise_gdf, LDEN_COLS, weights, 478_000, energy=ds.energy))
+
+    slots = iter(range(300_000, 10_000_000, 1_000))
+    case("calculate_kpis (new slots)", lambda: calculate_kpis(next(slots), 5.0, 40, 35, 25))
+    case("calculate_kpis (cached)", lambda: calculate_kpis(478_000, 5.0, 40, 35, 25))
+    rng = np.random.default_rng(0)
+
+    def new_runways():
+        ss.runway_shares = dict(zip(ss.RUNWAYS, rng.random(len(ss.RUNWAYS))))
+        calculate_kpis(478_000, 5.0, 40, 35, 25)
+    case("calculate_kpis (new runway shares)", new_runways)
+
+    gdf = ss.noise.frame()
+    case("noise_choropleth_fig (cold geometry)", lambda: (charts._GEOJSON_CACHE.clear(), charts.noise_choropleth_fig(gdf, "diff")), n=1)
+    case("noise_choropleth_fig", lambda: charts.noise_choropleth_fig(gdf, "diff"))
+    fig = charts.noise_choropleth_fig(gdf, "diff")
+    case("noise_choropleth_fig to_json", lambda: fig.to_json(validate=False))
+    case("noise_hist_fig", lambda: charts.noise_hist_fig(gdf))
+    case("noise_hist_fig (population)", lambda: charts.noise_hist_fig(gdf, weight_by_population=True))
+
+    # Cargo fragment computation (as in app.py, without the widgets)
+    cargo = get_cargo_engine()
+    selection = CargoSelection(cargo)
+    scale = cargo.scale(550_000, 8.0)
+    k = cargo.category("Pharma")
+    country = itertools.cycle(range(len(cargo.countries)))
+
+    def cargo_view():
+        country_tons = cargo.country_tons(k, scale)
+        country_moves = cargo.country_movements(scale)
+        avg = np.divide(country_tons, country_moves, out=np.zeros_like(country_tons), where=country_moves != 0)
+        customdata = np.column_stack([a[:, d, f] for f in range(2) for a in (country_moves, country_tons, avg) for d in range(2)])
+        return charts.cargo_map_fig(cargo.iso3, cargo.countries, customdata), country_tons.sum(axis=(1, 2))
+    fig, total = cargo_view()
+
+    def cargo_kpis():
+        selection.totals(k, scale)
+        selection.excluded_movements(scale)
+        cargo.references(478_000, 5.0)[k]
+
+    def cargo_toggle():
+        selection.toggle(next(country))
+        cargo_kpis()
+        charts.set_cargo_map_z(fig, total, selection.excluded)
+    case("cargo fragment KPIs", cargo_kpis)
+    case("cargo fragment country toggle", cargo_toggle)
+    case("cargo fragment view rebuild", cargo_view)
+
+    return dict(cells=len(ds.noise_gdf), countries=len(cargo.countries), cases=results,
+                max_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+
+
+def run_scale(data_dir, repeat):
+    """run_cases() in a fresh interpreter on `data_dir` (clean cold start and peak RSS)."""
+    env = dict(os.environ, MAINPORT_DATA_DIR=data_dir)
+    out = subprocess.run([sys.executable, __file__, "--cases", "--repeat", str(repeat)],
+                         env=env, capture_output=True, text=True)
+    if out.returncode:
+        raise RuntimeError(f"benchmark cases failed on {data_dir}:\n{out.stderr[-3000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def to_frame(run):
+    rows = [dict(scale=scale, cells=res["cells"], case=name, **m)
+            for scale, res in run["scales"].items() for name, m in res["cases"].items()]
+    return pd.DataFrame(rows)
+
+
+def previous_results(results_dir=RESULTS_DIR):
+    """Latest earlier median of every (scale, case) in `results_dir`, with the revision it was run on."""
+    files = sorted(f for f in os.listdir(results_dir) if f.endswith(".json")) if os.path.isdir(results_dir) else []
+    frames = []
+    for fname in files:
+        with open(os.path.join(results_dir, fname)) as f:
+            run = json.load(f)
+        frames.append(to_frame(run).assign(prev_revision=run["revision"]))
+    if not frames:
+        return None
+    df = pd.concat(frames, ignore_index=True).drop_duplicates(["scale", "case"], keep="last")
+    return df[["scale", "case", "median_ms", "prev_revision"]].rename(columns={"median_ms": "prev_median_ms"})
+
+
+def compare(run, previous):
+    """Median times of `run` next to the previous ones of the same case and scale."""
+    df = to_frame(run)
+    if previous is None:
+        return df
+    df = df.merge(previous, on=["scale", "case"], how="left")
+    df["change_pct"] = 100 * (df["median_ms"] / df["prev_median_ms"] - 1)
+    return df
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the model and rendering hot paths on the real data and synthetic data sets of factor × its size.")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES), help="data set sizes relative to the real data (1: the real data)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument("--cases", action="store_true", help=argparse.SUPPRESS)  # worker mode
+    args = parser.parse_args()
+
+    if args.cases:
+        print(json.dumps(run_cases(args.repeat)))
+        sys.exit()
+
+    previous = previous_results(args.results_dir)
+    run = dict(time=datetime.now(timezone.utc).isoformat(timespec="seconds"), revision=_revision(),
+               repeat=args.repeat, scales={})
+    with tempfile.TemporaryDirectory() as tmp:
+        for factor in args.scales:
+            data_dir = args.data_dir if factor == 1 else scaled_data_dir(factor, tmp, args.data_dir)
+            run["scales"][str(factor)] = run_scale(data_dir, args.repeat)
+            print(f"x{factor}: {run['scales'][str(factor)]['cells']:,} cells, "
+                  f"max RSS {run['scales'][str(factor)]['max_rss_mb']:,.0f} MB", file=sys.stderr)
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    path = os.path.join(args.results_dir, f"{run['time'].replace(':', '')}-{run['revision'] or 'local'}.json")
+    with open(path, "w") as f:
+        json.dump(run, f, indent=1)
+
+    table = compare(run, previous)
+    with pd.option_context("display.width", 200, "display.max_rows", None):
+        print(table.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+    print(f"\nSaved {path}")
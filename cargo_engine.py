@@ -0,0 +1,177 @@
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+
+import numpy as np
+
+from datasets import read_only
+
+# Label -> column prefix in the cargo data; None = all categories together
+CARGO_CATEGORIES = {
+    "Totaal": None,
+    "Perishables": "Perishables",
+    "Fashion & textiel": "Fashion_en_textiel",
+    "Machines & elektronica": "Machines_en_elektronica",
+    "Transport": "Transport",
+    "Pharma": "Pharma",
+    "Industrie & materialen": "Industrie_en_materialen",
+    "Low value bulk": "Low_value_bulk",
+    "Overig": "Overig",
+}
+
+# The cargo data describes BASE_FREIGHT_SHARE % freight slots at BASE_SLOTS
+BASE_SLOTS = 478_000
+BASE_FREIGHT_SHARE = 5.0
+
+DIRECTIONS = ("in", "out")
+FLOWS = ("freight", "belly")
+# [direction][flow] columns of tons and movements
+TON_COLS = [["Cargo-in full freight (tons)", "Cargo-in belly (tons)"],
+            ["Cargo-out full freight (tons)", "Cargo-out belly (tons)"]]
+MOVEMENT_COLS = [["Arrivals full-freight", "Arrivals belly"],
+                 ["Departures full-freight", "Departures belly"]]
+
+
+class CargoEngine:
+    """
+    Cargo per country compiled into dense tensors at load.
+
+    `tons` and `eur` are (countries, categories, direction, flow) at the base slot mix, with
+    category 0..K-1 in CARGO_CATEGORIES order; `movements` is (countries, direction, flow).
+    A category, a freight/belly scale and a set of excluded countries then reduce to
+    precomputed sums over the country axis (see CargoSelection).
+    """
+
+    def __init__(self, cargo_data, categories=CARGO_CATEGORIES, max_references=64):
+        self.labels = list(categories)
+        self.max_references = max_references
+        self._references = OrderedDict()    # (slots, freight %) -> references()
+        self._lock = threading.Lock()
+        self.countries = cargo_data["country"].to_numpy()
+        self.iso3 = cargo_data["iso3"].to_numpy()
+
+        def cols(names):
+            return np.stack([np.stack([cargo_data[c].to_numpy(dtype=np.float64) for c in row], axis=-1)
+                             for row in names], axis=1)
+
+        base = cols(TON_COLS)                       # (C, dir, flow)
+        self.movements = read_only(cols(MOVEMENT_COLS))
+        prefixes = [p for p in categories.values() if p is not None]
+        frac, ept = [], []
+        for p in categories.values():
+            if p is None:
+                frac.append(np.ones((len(cargo_data), 2)))
+                # weighted €/ton over all categories; a missing price leaves the country without value
+                ept.append(sum(np.stack([cargo_data[f"{q}_fraction_{d}"] * cargo_data[f"{q}_eur_per_ton_{d}"]
+                                         for d in DIRECTIONS], axis=-1) for q in prefixes))
+            else:
+                frac.append(np.stack([cargo_data[f"{p}_fraction_{d}"] for d in DIRECTIONS], axis=-1))
+                ept.append(np.stack([cargo_data[f"{p}_eur_per_ton_{d}"] for d in DIRECTIONS], axis=-1))
+        frac = np.stack(frac, axis=1)[..., None]    # (C, K, dir, 1)
+        ept = np.stack(ept, axis=1)[..., None]
+        tons = base[:, None] * frac
+        self.tons = read_only(tons)
+        self.eur = read_only(np.nan_to_num(tons * ept))
+        # All-country sums (categories, direction, flow)
+        self.total_tons = read_only(self.tons.sum(axis=0))
+        self.total_eur = read_only(self.eur.sum(axis=0))
+
+    @staticmethod
+    def scale(slots, freight_pct):
+        """(freight, belly) factors of the base movements and tons for `slots` at `freight_pct` %."""
+        base_freight = BASE_SLOTS * BASE_FREIGHT_SHARE / 100
+        base_belly = BASE_SLOTS * (100 - BASE_FREIGHT_SHARE) / 100
+        freight = int(slots) * freight_pct / 100 / base_freight if base_freight > 0 else 1
+        belly = int(slots) * (100 - freight_pct) / 100 / base_belly if base_belly > 0 else 1
+        return np.array([freight, belly])
+
+    def category(self, label):
+        return self.labels.index(label)
+
+    def totals(self, k, scale):
+        """Tons and € (direction, flow) of category `k` over all countries at `scale`."""
+        return self.total_tons[k] * scale, self.total_eur[k] * scale
+
+    def references(self, slots, freight_pct):
+        """
+        Reference KPIs of every category over all countries at a pinned slot mix, one
+        read-only mapping per category (keys as the cargo KPIs). One vectorised pass;
+        cached per pin and shared by all sessions.
+        """
+        key = (slots, freight_pct)
+        with self._lock:
+            refs = self._references.get(key)
+            if refs is not None:
+                self._references.move_to_end(key)
+                return refs
+        scale = self.scale(slots, freight_pct)
+        tons, eur = self.total_tons * scale, self.total_eur * scale     # (K, direction, flow)
+        refs = tuple(
+            MappingProxyType({
+                'cargo_freight_in': t[0, 0],
+                'cargo_freight_out': t[1, 0],
+                'cargo_belly_in': t[0, 1],
+                'cargo_belly_out': t[1, 1],
+                'eur_freight_in': e[0, 0],
+                'eur_freight_out': e[1, 0],
+                'eur_belly_in': e[0, 1],
+                'eur_belly_out': e[1, 1],
+            })
+            for t, e in zip(tons, eur)
+        )
+        with self._lock:
+            self._references[key] = refs
+            while len(self._references) > self.max_references:
+                self._references.popitem(last=False)
+        return refs
+
+    def country_tons(self, k, scale):
+        """Tons per country (C, direction, flow) of category `k` at `scale`."""
+        return self.tons[:, k] * scale
+
+    def country_movements(self, scale):
+        return self.movements * scale
+
+
+class CargoSelection:
+    """
+    A session's excluded countries as a mask with running sums of what they contribute.
+
+    Toggling a country adds or subtracts its tons, € and movements (all categories, base
+    scale), so the active totals are the all-country totals minus these sums at any scale.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.reset()
+
+    def reset(self):
+        n, K = self.engine.tons.shape[:2]
+        self.excluded = np.zeros(n, dtype=bool)
+        self.count = 0
+        self._tons = np.zeros((K, 2, 2))
+        self._eur = np.zeros((K, 2, 2))
+        self._movements = np.zeros((2, 2))
+
+    def toggle(self, i):
+        """Exclude country row `i`, or include it again if it was excluded."""
+        sign = -1.0 if self.excluded[i] else 1.0
+        self.excluded[i] = not self.excluded[i]
+        self.count += int(sign)
+        self._tons += sign * self.engine.tons[i]
+        self._eur += sign * self.engine.eur[i]
+        self._movements += sign * self.engine.movements[i]
+
+    def __len__(self):
+        return self.count
+
+    def totals(self, k, scale):
+        """Tons and € (direction, flow) of category `k` over the active countries."""
+        e = self.engine
+        if not self.count:
+            # exact all-country sums (no subtraction round-off when nothing is excluded)
+            return e.total_tons[k] * scale, e.total_eur[k] * scale
+        return (e.total_tons[k] - self._tons[k]) * scale, (e.total_eur[k] - self._eur[k]) * scale
+
+    def excluded_movements(self, scale):
+        return float((self._movements * scale).sum()) if self.count else 0.0
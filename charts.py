@@ -4,7 +4,11 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 import geopandas as gpd
-import json
+import shapely
+import plotly.io as pio
+from datasets import GEOMETRY_TOLERANCES, geometry_level
+from noise_raster import CellRaster, RasterCache, colour_scale, png_data_uri
+from timing import span
 
 ss = st.session_state
 
@@ -58,45 +62,175 @@ def cargo_hist_fig(seg: pd.DataFrame):
     )
     return fig
 
-def noise_choropleth_fig(gdf: pd.DataFrame, color_col: str = "diff"):
+
+# Geometry-only GeoJSON per noise layer and simplification level, keyed by
+# gdf.attrs["geometry_key"] (set by the dataset registry and kept on session copies).
+# Polygons never change between scenarios.
+_GEOJSON_CACHE = {}
+
+# Raster render mode: plotly's "green"/"yellow"/"red" scale and the rendered overlays
+NOISE_COLOURS = [(0, 128, 0), (255, 255, 0), (255, 0, 0)]
+_RASTER_CACHE = RasterCache()
+
+
+def _geojson_coords(g):
+    if g.geom_type == "Polygon":
+        return [np.asarray(g.exterior.coords)] + [np.asarray(r.coords) for r in g.interiors]
+    return [_geojson_coords(p) for p in g.geoms]
+
+
+def _num_coords(c):
+    return len(c) if isinstance(c, np.ndarray) else sum(_num_coords(p) for p in c)
+
+
+def _cached_geometry(gdf, name, build):
+    key = gdf.attrs.get("geometry_key")
+    if key is not None and (key, name) in _GEOJSON_CACHE:
+        return _GEOJSON_CACHE[(key, name)]
+    with span(f"geometry {name}"):
+        entry = build(gdf.geometry.reset_index(drop=True))
+    if key is not None:
+        _GEOJSON_CACHE[(key, name)] = entry
+    return entry
+
+
+def noise_view(gdf):
+    """Return (center, zoom) that fits the noise polygons, computed once per geometry."""
+    return _cached_geometry(gdf, "view", _bounds_center_zoom)
+
+
+def noise_geojson(gdf, tolerance=0.0):
+    """Return (geojson, feature ids) for the polygons in `gdf`, simplified to `tolerance` degrees.
+    Built once per geometry and level; the simplified polygons come with the registry (see
+    datasets.compile_pyramid) and are only simplified here for layers from elsewhere.
+    """
+    def build(geom):
+        if tolerance > 0:
+            simplified = geometry_level(gdf.attrs.get("geometry_key"), tolerance)
+            if simplified is None:
+                # coverage simplification keeps the shared edges between neighbouring cells intact
+                simplified = shapely.coverage_simplify(geom.values, tolerance)
+            geom = gpd.GeoSeries(simplified, crs=geom.crs)
+        # Plotly needs a feature id; we'll use the position. No properties: values go in z.
+        # Rings are numpy arrays: plotly deep-copies trace props on every figure, and copying
+        # a few thousand arrays is far cheaper than copying millions of nested coordinate lists.
+        geojson = dict(type="FeatureCollection", features=[
+            dict(type="Feature", id=str(i), geometry=dict(type=g.geom_type, coordinates=_geojson_coords(g)))
+            for i, g in enumerate(geom)
+        ])
+        return geojson, geom.index.astype(str).to_numpy()
+    return _cached_geometry(gdf, tolerance, build)
+
+
+def tolerance_for_zoom(zoom):
+    """Coarsest pyramid level whose tolerance stays below half a screen pixel at `zoom`."""
+    half_pixel = 360.0 / (256 * 2 ** zoom) / 2
+    return max(t for t in GEOMETRY_TOLERANCES if t <= half_pixel)
+
+
+def geometry_pyramid_report(gdf):
+    """Coordinates and serialised GeoJSON size per pyramid level (builds every level)."""
+    rows = []
+    for tol in GEOMETRY_TOLERANCES:
+        geojson, _ = noise_geojson(gdf, tol)
+        payload = pio.json.to_json_plotly(geojson)
+        rows.append(dict(
+            tolerance=tol,
+            coordinates=sum(_num_coords(f["geometry"]["coordinates"]) for f in geojson["features"]),
+            payload_mb=len(payload) / 1e6,
+            max_zoom=next((z for z in range(22, -1, -1) if tolerance_for_zoom(z) >= tol), 0),
+        ))
+    return pd.DataFrame(rows)
+
+
+def noise_choropleth_fig(gdf: pd.DataFrame, color_col: str = "diff", zoom=None):
     """Create a choropleth from a GeoDataFrame with polygon geometry.
-    Expects columns: geometry; and a numeric column to color by (default 'Lden_sim').
+    Expects columns: geometry; and a numeric column to color by ('diff', or 'Lden' for 'scenario').
     If gdf is None or empty, return an empty placeholder figure.
+    The GeoJSON is cached per geometry, so a rerun only rebuilds the colour array; gdf is not modified.
+    Polygons are simplified to the pyramid level that suits `zoom` (default: the fitted zoom).
     """
 
-    gdf['Lden'] = gdf['scenario']
-    
-    if color_col not in gdf.columns:
-        # fall back to 'Lden' if available
-        color_col = "diff" if "diff" in gdf.columns else None
+    color_col, values = _noise_color_values(gdf, color_col)
     if color_col is None:
         return px.choropleth_mapbox(pd.DataFrame(dict(dummy=[])), geojson={}, locations="dummy", mapbox_style="open-street-map", zoom=9, center=dict(lat=52.308, lon=4.764), opacity=0.6, color_continuous_scale=["red", "orange", "yellow", "green"])
 
     midpoint = 0 if color_col == 'diff' else None
-    # Plotly needs a feature id; we'll use the index
-    gdf = gdf.reset_index(drop=True)
-    gdf["fid"] = gdf.index.astype(str)
-    geojson = json.loads(gdf.to_json())
-
-    center, zoom = _bounds_center_zoom(gdf)
-    print(gdf.geom_type.value_counts())
-    print(color_col)
-    fig = px.choropleth_map(
-        gdf,
+    center, fit_zoom = noise_view(gdf)
+    zoom = fit_zoom if zoom is None else zoom
+    geojson, fids = noise_geojson(gdf, tolerance_for_zoom(zoom))
+
+    fig = go.Figure(go.Choroplethmap(
         geojson=geojson,
-        locations="fid",
-        color=color_col,
+        locations=fids,
+        z=values,
+        zmid=midpoint,
+        colorscale=["green", "yellow", "red"],
+        marker_opacity=0.6,
+        marker_line_width=0.5,
+        customdata=np.asarray(gdf['aantalInwoners']),
+        hovertemplate=f"{color_col}=%{{z}}<br>aantalInwoners=%{{customdata}}<extra></extra>",
+        colorbar=dict(title=color_col),
+    ))
+    fig.update_layout(
+        map_style="carto-positron",  # no token required
+        map_center=center,
+        map_zoom=zoom,
+        margin=dict(l=10, r=10, t=40, b=10),
+    )
+    return fig
+
+def noise_raster_fig(gdf: pd.DataFrame, color_col: str = "diff", width: int = 800):
+    """Noise map as a server-rendered PNG overlay instead of polygons.
+    Latency stays flat in the number of cells: the pixel → cell lookup is built once per
+    geometry and each rendered image is cached per value array. No per-cell hover.
+    """
+    color_col, values = _noise_color_values(gdf, color_col)
+    if color_col is None:
+        return noise_choropleth_fig(gdf, color_col)
+
+    midpoint = 0 if color_col == 'diff' else None
+    center, zoom = noise_view(gdf)
+    raster = _cached_geometry(gdf, ("raster", width), lambda geom: CellRaster(geom.values, width))
+
+    def render():
+        rgba, zmin, zmax = colour_scale(values, NOISE_COLOURS, zmid=midpoint)
+        return png_data_uri(raster.rasterise(rgba)), zmin, zmax
+
+    key = _RASTER_CACHE.key(gdf.attrs.get("geometry_key"), width, color_col, values=values)
+    uri, zmin, zmax = _RASTER_CACHE.get_or_render(key, render)
+
+    # Invisible marker trace that only carries the colour bar
+    fig = go.Figure(go.Scattermap(
+        lat=[center["lat"]] * 2, lon=[center["lon"]] * 2, mode="markers",
+        marker=dict(color=[zmin, zmax], colorscale=["green", "yellow", "red"], opacity=0,
+                    showscale=True, colorbar=dict(title=color_col)),
+        hoverinfo="skip",
+    ))
+    fig.update_layout(
         map_style="carto-positron",  # no token required
-        center=center,
-        zoom=zoom,
-        opacity=0.6,
-        color_continuous_scale=["green", "yellow",  "red"],
-        color_continuous_midpoint=midpoint,
-        hover_data=['aantalInwoners'],
+        map_center=center,
+        map_zoom=zoom,
+        map_layers=[dict(sourcetype="image", source=uri, coordinates=raster.coordinates, opacity=0.6)],
+        margin=dict(l=10, r=10, t=40, b=10),
     )
-    fig.update_layout(margin=dict(l=10, r=10, t=40, b=10))
     return fig
 
+
+def _noise_color_values(gdf, color_col):
+    """Resolve the colour column ('Lden' reads 'scenario'); returns (col, float array) or (None, None)."""
+    columns = dict(gdf.items()) if gdf is not None else {}
+    if "scenario" in columns:
+        columns["Lden"] = columns["scenario"]
+
+    if color_col not in columns:
+        # fall back to 'diff' if available
+        color_col = "diff" if "diff" in columns else None
+    if color_col is None:
+        return None, None
+    return color_col, np.asarray(columns[color_col], dtype=np.float64)
+
+
 def _bounds_center_zoom(gdf):
     minx, miny, maxx, maxy = gdf.total_bounds
     cx = (minx + maxx) / 2
@@ -116,12 +250,42 @@ def _bounds_center_zoom(gdf):
     return dict(lat=cy, lon=cx), z
 
 
-def noise_hist_fig(ndf: pd.DataFrame):
-    if ndf is None or len(ndf) == 0 or ("diff" not in ndf.columns and "Lden" not in ndf.columns):
+def fixed_bins(values, size=0.1, weights=None):
+    """Histogram on fixed edges (multiples of `size`) via np.bincount.
+    Returns (bin centres, counts or summed weights); only occupied range is returned.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    ok = np.isfinite(values)
+    values = values[ok]
+    if len(values) == 0:
+        return np.empty(0), np.empty(0)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)[ok]
+    idx = np.floor(values / size).astype(np.int64)
+    first = idx.min()
+    counts = np.bincount(idx - first, weights=weights)
+    centres = (first + np.arange(len(counts)) + 0.5) * size
+    return centres, counts
+
+
+def noise_hist_fig(ndf: pd.DataFrame, weight_by_population: bool = False):
+    """Distribution of diff (or Lden) per 0.1 dB, binned server-side.
+    Only bin counts are sent to the browser, so the payload does not grow with the cell count.
+    With weight_by_population, bins hold residents (aantalInwoners) instead of cells.
+    """
+    cols = [c for c in ("diff", "Lden", "scenario") if ndf is not None and c in ndf.columns]
+    if ndf is None or len(ndf) == 0 or not cols:
         return px.histogram(pd.DataFrame(dict(Lden=[])), x="Lden", nbins=40, title="Distribution of Lden")
-    col = "diff" if "diff" in ndf.columns else "Lden"
-    fig = px.histogram(ndf, x=col, title="Distribution of Lden")
-    fig.update_traces(xbins=dict(size=0.1))
+    col = cols[0]
+    weights = ndf['aantalInwoners'] if weight_by_population else None
+    centres, counts = fixed_bins(ndf[col], size=0.1, weights=weights)
+    fig = go.Figure(go.Bar(x=centres, y=counts, width=0.1, marker_line_width=0, name=col))
+    fig.update_layout(
+        title="Population by Lden" if weight_by_population else "Distribution of Lden",
+        xaxis_title=col,
+        yaxis_title="population" if weight_by_population else "count",
+        bargap=0,
+    )
     data_min, data_max = ndf[col].min(), ndf[col].max()
     data_center = (data_min + data_max) / 2
     half_range = max((data_max - data_min) / 2, 0.5)  # at least 1 wide
@@ -143,3 +307,83 @@ def noise_hist_fig(ndf: pd.DataFrame):
         )
     )
     return fig
+
+
+def exposure_curve_fig(curve: pd.DataFrame):
+    """Population exposed above each Lden threshold (columns: threshold, population)."""
+    if curve is None or len(curve) == 0:
+        return px.line()
+    fig = px.line(curve, x="threshold", y="population", markers=True,
+                  title="Population exposed above Lden threshold",
+                  labels=dict(threshold="Lden (dB)", population="Population"))
+    fig.update_layout(
+        margin=dict(l=0, r=0, t=20, b=50),
+        height=300,
+        title_font=dict(
+            size=12,
+            family="Arial",
+            color="black"
+        ),
+        title = dict(
+            x = 0.5,
+            xanchor="center",
+
+        )
+    )
+    return fig
+
+
+CARGO_HOVER = (
+    '%{text}<br>'
+    '<b>Freight</b>  Arr: %{customdata[0]:,.0f} · Dep: %{customdata[1]:,.0f}<br>'
+    '  Capacity in: %{customdata[2]:,.0f} t · out: %{customdata[3]:,.0f} t<br>'
+    '  Avg/flight in: %{customdata[4]:,.1f} t · out: %{customdata[5]:,.1f} t<br>'
+    '<b>Belly</b>  Arr: %{customdata[6]:,.0f} · Dep: %{customdata[7]:,.0f}<br>'
+    '  Capacity in: %{customdata[8]:,.0f} t · out: %{customdata[9]:,.0f} t<br>'
+    '  Avg/flight in: %{customdata[10]:,.1f} t · out: %{customdata[11]:,.1f} t'
+    '<extra></extra>'
+)
+
+
+def cargo_map_fig(iso3, countries, customdata):
+    """
+    Cargo choropleth: trace 0 for active countries, trace 1 (grey) for excluded ones.
+    Both traces hold every country; set_cargo_map_z decides which one draws it.
+
+    Build once and keep it: with the skeleton (locations, text, hover, layout) unchanged
+    and a fixed uirevision, Plotly.react in the browser only restyles the arrays that
+    changed and keeps the user's pan/zoom. Values go out as float32 to halve the payload.
+    """
+    customdata = np.asarray(customdata, dtype=np.float32)
+    fig = go.Figure()
+    fig.add_trace(go.Choropleth(
+        locations=iso3,
+        text=countries,
+        customdata=customdata,
+        colorscale="YlOrRd",
+        hovertemplate=CARGO_HOVER,
+        colorbar=dict(title="Cargo capacity (tons)"),
+        marker_line_width=0.5,
+    ))
+    fig.add_trace(go.Choropleth(
+        locations=iso3,
+        text=countries,
+        customdata=customdata,
+        colorscale=[[0, '#d3d3d3'], [1, '#d3d3d3']],
+        hovertemplate=CARGO_HOVER.replace('%{text}', '%{text} (excluded)'),
+        showscale=False,
+        marker_line_width=0.5,
+    ))
+    fig.update_layout(
+        height=600, margin=dict(l=10, r=10, t=30, b=10),
+        geo=dict(projection_type="natural earth", uirevision="cargo-map"),
+        uirevision="cargo-map",
+    )
+    return fig
+
+
+def set_cargo_map_z(fig, total, excluded):
+    """Cargo per country on the active trace, excluded countries on the grey one (NaN is not drawn)."""
+    total = np.asarray(total, dtype=np.float32)
+    fig.data[0].z = np.where(excluded, np.float32(np.nan), total)
+    fig.data[1].z = np.where(excluded, total, np.float32(np.nan))
@@ -0,0 +1,306 @@
+import os
+import hashlib
+import tempfile
+from dataclasses import dataclass, fields
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+import pyarrow as pa
+from pyarrow import feather
+
+from noise_engine import NoiseEngine, LDEN_COLS, REFERENCE_COUNTS, REFERENCE_SLOTS
+
+# MAINPORT_DATA_DIR points the app (and benchmarks / load tests) at another data set
+DATA_DIR = os.environ.get("MAINPORT_DATA_DIR", "data")
+
+# Parameter tables: name -> (xlsx source, index column). They are compiled into Arrow files
+# (one per table) so session start does not need openpyxl; rebuilt when a source changes.
+PARAM_TABLES = {
+    "scenarios": ("scenarios.xlsx", "scenario"),
+    "haul_dist": ("haul_distributions.xlsx", "type"),
+    "econ_fact": ("economische_factoren.xlsx", "type"),
+}
+PARAMS_BUNDLE = "params.{}.feather"
+PARAMS_BUNDLE_VERSION = 2
+# Schema metadata key of the sources' content hash in each compiled table
+PARAMS_HASH_KEY = b"params_hash"
+
+NOISE_FILE = "geluid_banen.ftr"
+# Noise map geometry pyramid: simplification tolerances in degrees, finest first (0 = full
+# resolution). The simplified levels are compiled next to the noise layer and loaded with
+# the registry, so no rerun waits for the simplification; rebuilt when the layer changes.
+GEOMETRY_TOLERANCES = (0.0, 0.0002, 0.0005, 0.001, 0.002)
+NOISE_PYRAMID = "geluid_banen.pyramid.feather"
+PYRAMID_HASH_KEY = b"source_hash"
+# Simplified polygons {tolerance: geometries} per registry noise layer, by geometry key
+_GEOMETRY_LEVELS = {}
+
+
+@dataclass(frozen=True, eq=False)
+class Datasets:
+    """
+    Read-only input data shared by every session in the process.
+
+    Sessions keep references to these objects and must not modify them; per-scenario
+    columns go on a session's own shallow copy of `noise_gdf` (see session_noise_gdf).
+    Hashed by identity, so per-dataset engines can be cached on it.
+    """
+    noise_gdf: gpd.GeoDataFrame   # geometry, postcode, aantalInwoners (>= 0), Lden_*, normal
+    energy: np.ndarray            # 10^(Lden/10), cells × runways in LDEN_COLS order
+    population: np.ndarray        # aantalInwoners per cell
+    normal: np.ndarray            # baseline Lden at default runway counts and slots
+    scenarios: pd.DataFrame
+    haul_dist: pd.DataFrame
+    econ_fact: pd.DataFrame
+    cargo_data: pd.DataFrame
+
+
+def read_only(a):
+    """Contiguous, non-writeable array (shared by sessions or processes)."""
+    a = np.ascontiguousarray(a)
+    a.setflags(write=False)
+    return a
+
+
+def params_hash(data_dir=DATA_DIR):
+    """Content hash of the parameter xlsx sources, or None if any of them is missing."""
+    h = hashlib.sha256(f"v{PARAMS_BUNDLE_VERSION}".encode())
+    for fname, _ in PARAM_TABLES.values():
+        path = os.path.join(data_dir, fname)
+        if not os.path.exists(path):
+            return None
+        h.update(fname.encode())
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def _write_arrow(table, path, **metadata):
+    """Write `table` as a feather file with extra schema metadata (str values)."""
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                           **{k.encode(): v.encode() for k, v in metadata.items()}})
+    # a temp file of its own, then rename: neither concurrent compiles nor readers see half a file
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or ".", suffix=".tmp", delete=False) as f:
+        tmp = f.name
+    try:
+        feather.write_feather(table, tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def compile_params(data_dir=DATA_DIR):
+    """Parse the parameter xlsx sources and write the compiled tables; returns the tables."""
+    tables = {
+        name: pd.read_excel(os.path.join(data_dir, fname)).set_index(index)
+        for name, (fname, index) in PARAM_TABLES.items()
+    }
+    content_hash = params_hash(data_dir)
+    try:
+        for name, df in tables.items():
+            _write_arrow(pa.Table.from_pandas(df), os.path.join(data_dir, PARAMS_BUNDLE.format(name)),
+                         **{PARAMS_HASH_KEY.decode(): content_hash})
+    except OSError:
+        pass  # read-only data dir: still usable, just parsed from xlsx every start
+    return tables
+
+
+def load_params(data_dir=DATA_DIR):
+    """Parameter tables from the compiled files; recompiled first if a source xlsx changed."""
+    tables, hashes = {}, set()
+    try:
+        for name in PARAM_TABLES:
+            table = feather.read_table(os.path.join(data_dir, PARAMS_BUNDLE.format(name)))
+            hashes.add((table.schema.metadata or {}).get(PARAMS_HASH_KEY))
+            tables[name] = table.to_pandas()
+    except Exception:
+        tables = None  # missing, partly written or unreadable: compile from the sources
+    current = params_hash(data_dir)
+    # all tables from one compile; without sources (bundle-only deployment) taken as is
+    if tables is not None and len(hashes) == 1 and (current is None or hashes == {current.encode()}):
+        return tables
+    return compile_params(data_dir)
+
+
+def pyramid_hash(data_dir=DATA_DIR):
+    """Content hash of the noise layer and the pyramid tolerances."""
+    h = hashlib.sha256(repr(GEOMETRY_TOLERANCES).encode())
+    with open(os.path.join(data_dir, NOISE_FILE), "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def compile_pyramid(data_dir=DATA_DIR, geometry=None):
+    """
+    Simplify the noise polygons to every coarser pyramid level and write them next to the
+    layer; returns {tolerance: geometries}. Coverage simplification keeps the shared edges
+    between neighbouring cells intact, but takes long on large grids: run it at deploy
+    (python datasets.py compile) rather than in the first session.
+    """
+    if geometry is None:
+        geometry = gpd.read_feather(os.path.join(data_dir, NOISE_FILE)).geometry.values
+    levels = {}
+    for tol in GEOMETRY_TOLERANCES[1:]:
+        levels[tol] = shapely.coverage_simplify(np.asarray(geometry), tol)
+        levels[tol].setflags(write=False)
+    table = pa.table({str(tol): shapely.to_wkb(g) for tol, g in levels.items()})
+    try:
+        _write_arrow(table, os.path.join(data_dir, NOISE_PYRAMID), **{PYRAMID_HASH_KEY.decode(): pyramid_hash(data_dir)})
+    except OSError:
+        pass  # read-only data dir: simplified again at every start
+    return levels
+
+
+def load_pyramid(data_dir=DATA_DIR, geometry=None):
+    """Simplified pyramid levels from the compiled file; recompiled first if the noise layer changed."""
+    try:
+        table = feather.read_table(os.path.join(data_dir, NOISE_PYRAMID))
+        if (table.schema.metadata or {}).get(PYRAMID_HASH_KEY) == pyramid_hash(data_dir).encode():
+            levels = {}
+            for tol in GEOMETRY_TOLERANCES[1:]:
+                levels[tol] = shapely.from_wkb(table.column(str(tol)).to_numpy(zero_copy_only=False))
+                levels[tol].setflags(write=False)
+            return levels
+    except Exception:
+        pass  # missing, partly written or unreadable: compile from the layer
+    return compile_pyramid(data_dir, geometry)
+
+
+def geometry_level(geometry_key, tolerance):
+    """Polygons of a registry noise layer simplified to `tolerance` (loaded with it), or None."""
+    return _GEOMETRY_LEVELS.get(geometry_key, {}).get(tolerance)
+
+
+def load_datasets(data_dir=DATA_DIR):
+    """Read all dashboard inputs from `data_dir` (uncached; use get_datasets)."""
+    noise_gdf = gpd.read_feather(os.path.join(data_dir, NOISE_FILE))
+    noise_gdf["aantalInwoners"] = np.where(noise_gdf["aantalInwoners"] < 0, 0, noise_gdf["aantalInwoners"])
+    energy = read_only(10.0 ** (noise_gdf[LDEN_COLS].to_numpy(dtype=np.float64) / 10.0))
+    population = read_only(noise_gdf["aantalInwoners"].to_numpy())
+    engine = NoiseEngine(energy, population)
+    normal = read_only(engine.field(REFERENCE_COUNTS) + engine.offset(REFERENCE_SLOTS))
+    noise_gdf["normal"] = normal
+    # Lets charts cache the serialised polygons; attrs survive the per-session copies
+    noise_gdf.attrs["geometry_key"] = os.path.abspath(os.path.join(data_dir, NOISE_FILE))
+    _GEOMETRY_LEVELS[noise_gdf.attrs["geometry_key"]] = load_pyramid(data_dir, noise_gdf.geometry.values)
+
+    cargo_data = pd.read_csv(os.path.join(data_dir, "combined_country_cargo_per_category.csv"))
+    cargo_data['cargo_in'] = cargo_data['Cargo-in full freight (tons)'] + cargo_data['Cargo-in belly (tons)']
+    cargo_data['cargo_out'] = cargo_data['Cargo-out full freight (tons)'] + cargo_data['Cargo-out belly (tons)']
+
+    return Datasets(
+        noise_gdf=noise_gdf,
+        energy=energy,
+        population=population,
+        normal=normal,
+        cargo_data=cargo_data,
+        **load_params(data_dir),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_datasets(data_dir=DATA_DIR):
+    """Process-wide registry: datasets are loaded once per `data_dir` and shared by all sessions."""
+    return load_datasets(data_dir)
+
+
+def session_noise_gdf(ds):
+    """Shallow per-session view of the noise layer: shares geometry and data, gets its own columns."""
+    return ds.noise_gdf.copy(deep=False)
+
+
+class SessionNoise:
+    """
+    A session's noise fields on top of the shared noise layer.
+
+    Geometry, population and runway layers stay in the registry. `scenario` and `pinned`
+    are references to read-only level arrays (the result cache's, or the baseline); the
+    session only owns the float32 `diff` between them.
+    """
+
+    def __init__(self, ds, pinned=None):
+        self.ds = ds
+        self.scenario = ds.normal
+        self.pinned = ds.normal if pinned is None else pinned
+        self.diff = np.zeros(len(ds.normal), dtype=np.float32)
+
+    def update(self, levels, diff):
+        """Current scenario levels (kept by reference) and their diff to the pin."""
+        self.scenario = levels
+        self.diff = np.asarray(diff, dtype=np.float32)
+
+    def pin(self, levels=None):
+        """Use `levels` (default: the current scenario) as diff reference; no copy is made."""
+        self.pinned = self.scenario if levels is None else levels
+
+    def frame(self):
+        """GeoDataFrame for the charts: shared layer plus scenario / diff columns, built per use."""
+        gdf = session_noise_gdf(self.ds)
+        gdf["scenario"] = self.scenario
+        gdf["diff"] = self.diff
+        return gdf
+
+    def nbytes(self):
+        """Bytes this session holds on its own (shared read-only arrays not counted)."""
+        own = {id(a): a.nbytes for a in (self.scenario, self.pinned, self.diff) if a.flags.writeable}
+        return sum(own.values())
+
+
+def nbytes(obj):
+    """Approximate in-memory size of an array or (Geo)DataFrame, including geometry coordinates."""
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, gpd.GeoDataFrame):
+        geom = obj.geometry.values
+        plain = obj.drop(columns=obj.geometry.name)
+        # 16 bytes per xy coordinate plus a small per-geometry object overhead
+        return int(plain.memory_usage(deep=True).sum() + 16 * shapely.get_num_coordinates(geom).sum() + 100 * len(geom))
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    return 0
+
+
+# Tables every session loaded for itself before the registry existed
+PER_SESSION_TABLES = ("noise_gdf", "scenarios", "haul_dist", "econ_fact", "cargo_data")
+
+
+def memory_report(ds, sessions=50):
+    """Memory held once by the registry versus loading the tables in each of `sessions` sessions."""
+    sizes = pd.Series({f.name: nbytes(getattr(ds, f.name)) / 1e6 for f in fields(ds)}, name="mb")
+    shared = sizes.sum()
+    per_session = sizes[list(PER_SESSION_TABLES)].sum()
+    return dict(
+        sizes_mb=sizes,
+        shared_mb=shared,
+        per_session_mb=per_session,
+        sessions=sessions,
+        saved_mb=per_session * sessions - shared,
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Dataset registry tools.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_compile = sub.add_parser("compile", help="compile the parameter xlsx files and the noise map pyramid into Arrow files")
+    p_compile.add_argument("--data-dir", default=DATA_DIR)
+    p_mem = sub.add_parser("memory", help="report registry memory versus per-session loading")
+    p_mem.add_argument("sessions", type=int, nargs="?", default=50)
+    args = parser.parse_args()
+
+    if args.cmd == "compile":
+        compile_params(args.data_dir)
+        print(f"Wrote {os.path.join(args.data_dir, PARAMS_BUNDLE.format('*'))} ({params_hash(args.data_dir)[:12]})")
+        compile_pyramid(args.data_dir)
+        print(f"Wrote {os.path.join(args.data_dir, NOISE_PYRAMID)} ({pyramid_hash(args.data_dir)[:12]})")
+    else:
+        n = args.sessions
+        rep = memory_report(get_datasets(), sessions=n)
+        print(rep["sizes_mb"].to_string(float_format=lambda x: f"{x:,.2f} MB"))
+        print(f"\nShared once: {rep['shared_mb']:,.1f} MB; per-session loading: {rep['per_session_mb']:,.1f} MB/session")
+        print(f"Saved with {n} sessions: {rep['saved_mb']:,.1f} MB")
@@ -1,37 +1,27 @@
+import functools
 import streamlit as st
-import numpy as np
 import re
 import pandas as pd
-import geopandas as gpd
+import plotly.io as pio
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import timing
+from profiling import RunProfiler
+from datasets import get_datasets, SessionNoise
+import model
+from model import (DEFAULT_SLOTS, DEFAULT_FREIGHT_SHARE, DEFAULT_PATH, DEFAULT_RUNWAY_COUNTS,
+                   default_runway_shares)
+# Re-exported for app.py, which star-imports this module
+from model import normalize_shares  # noqa: F401
+from noise_engine import delta_lden_from_haul_mix  # noqa: F401
 
 ss = st.session_state
 
-# -----------------------------
-# Shared default constants (single source of truth)
-# -----------------------------
-DEFAULT_SLOTS = 478_000
-DEFAULT_FREIGHT_SHARE = 5.0
-DEFAULT_PATH = "Hub optimized"
-DEFAULT_RUNWAY_COUNTS = {
-    "Polderbaan": 763,
-    "Zwanenburgbaan": 2058,
-    "Buitenveldertbaan": 1944,
-    "Oostbaan": 467,
-    "Aalsmeerbaan": 1322,
-    "Kaagbaan": 3110,
-}
 DEFAULT_SCENARIO_TITLE = "My Airport Scenario"
 
 # -----------------------------
 # Helpers
 # -----------------------------
 
-def default_runway_shares():
-    """Return normalised default runway shares (single source of truth)."""
-    RUNWAYS = list(DEFAULT_RUNWAY_COUNTS.keys())
-    return normalize_shares(dict(DEFAULT_RUNWAY_COUNTS), RUNWAYS)
-
-
 def ensure_defaults():
     if "scenario_title" not in st.session_state:
         st.session_state.scenario_title = DEFAULT_SCENARIO_TITLE
@@ -48,19 +38,19 @@ def ensure_defaults():
     if "path" not in st.session_state:
         st.session_state.path = DEFAULT_PATH
 
+    # Input tables are loaded once per process and shared; sessions only hold references
+    ds = get_datasets()
     if 'scenarios' not in ss:
-        ss.scenarios = pd.read_excel('data/scenarios.xlsx').set_index('scenario')
+        ss.scenarios = ds.scenarios
 
     if 'cargo_data' not in ss:
-        ss.cargo_data = pd.read_csv('data/combined_country_cargo_per_category.csv')
-        ss.cargo_data['cargo_in'] = ss.cargo_data['Cargo-in full freight (tons)'] + ss.cargo_data['Cargo-in belly (tons)']
-        ss.cargo_data['cargo_out'] = ss.cargo_data['Cargo-out full freight (tons)'] + ss.cargo_data['Cargo-out belly (tons)']
+        ss.cargo_data = ds.cargo_data
 
     if 'haul_dist' not in ss:
-        ss.haul_dist = pd.read_excel('data/haul_distributions.xlsx').set_index('type')
+        ss.haul_dist = ds.haul_dist
 
     if 'econ_fact' not in ss:
-        ss.econ_fact = pd.read_excel('data/economische_factoren.xlsx').set_index('type')
+        ss.econ_fact = ds.econ_fact
 
     if 'form_version' not in ss:
         ss.form_version = 0
@@ -87,38 +77,10 @@ def ensure_defaults():
     if "pinned_label" not in ss:
         ss.pinned_label = "Starting situation"
 
-    if 'noise_gdf' not in ss:
-        default_shares = default_runway_shares()
-        ss.noise_gdf = gpd.read_feather('data/geluid_banen.ftr')
-        ss.noise_gdf['aantalInwoners'] = np.where(ss.noise_gdf['aantalInwoners'] < 0, 0, ss.noise_gdf['aantalInwoners'])
-        ss.noise_gdf['normal'] = combine_lden_df_weighted(df = ss.noise_gdf,
-                                             cols = [
-                                                        "Lden_Polderbaan",
-                                                        "Lden_Zwanenburgbaan",
-                                                        "Lden_Buitenveldertbaan",
-                                                        "Lden_Oostbaan",
-                                                        "Lden_Aalsmeerbaan",
-                                                        "Lden_Kaagbaan",
-                                                    ],
-                                             weights = [default_shares['Polderbaan'],
-                                                        default_shares['Zwanenburgbaan'],
-                                                        default_shares['Buitenveldertbaan'],
-                                                        default_shares['Oostbaan'],
-                                                        default_shares['Aalsmeerbaan'],
-                                                        default_shares['Kaagbaan']],
-                                             slots=DEFAULT_SLOTS)
-        
-
-def normalize_shares(shares, keys):
-    vals = np.array([max(0.0, shares[k]) for k in keys], dtype=float)
-    s = vals.sum()
-
-    if s <= 0:
-        vals[:] = 1.0 / len(vals)
-    else:
-        vals /= s
+    if 'noise' not in ss:
+        # Geometry and layers shared; the session only owns its float32 diff
+        ss.noise = SessionNoise(ds)
 
-    return dict(zip(keys, vals))
 
 def slugify(text: str) -> str:
     text = (text or "").strip().lower()
@@ -132,31 +94,10 @@ def clamp(x, lo, hi):
 def scenario_defaults(path: str, slots: int, freight_share: float) -> dict:
     """
     Return default haul shares based on path + top inputs.
-    This is demo logic — replace with real rules.
+    Custom keeps the current UI values (won't be used for locking).
     """
-    if path in ("Hub optimized", "OD optimized"):
-        scenarios = ss.scenarios
-        haul_distributions = ss.haul_dist
-
-        short_slots = (478_000*haul_distributions.loc['short haul pax']['base_slot_frac'] +
-            max(slots - 478_000,0)*scenarios.loc[path]['short haul increase']/1000 +
-            max(478_000- slots,0)*scenarios.loc[path]['short haul decrease']/1000)
-        medium_slots = (478_000*haul_distributions.loc['medium haul pax']['base_slot_frac'] +
-            max(slots - 478_000,0)*scenarios.loc[path]['medium haul increase']/1000 +
-            max(478_000- slots,0)*scenarios.loc[path]['medium haul decrease']/1000)
-        long_slots = (478_000*haul_distributions.loc['long haul pax']['base_slot_frac'] +
-            max(slots - 478_000,0)*scenarios.loc[path]['long haul increase']/1000 +
-            max(478_000- slots,0)*scenarios.loc[path]['long haul decrease']/1000)
-        short = 100*short_slots/slots
-        medium = 100*medium_slots/slots
-        long = 100*long_slots/slots
-
-    else:  # Custom (won't be used for locking; we keep current UI)
-        short = st.session_state.get("ui_short", 40)
-        medium = st.session_state.get("ui_medium", 30)
-        long = 100 - short - medium
-
-    return {"short": int(short), "medium": int(medium), "long": int(long)}
+    custom = (st.session_state.get("ui_short", 40), st.session_state.get("ui_medium", 30))
+    return model.scenario_defaults(path, slots, freight_share, ss.scenarios, ss.haul_dist, custom=custom)
 
 def apply_path_defaults_to_ui():
     ensure_defaults()
@@ -403,9 +344,9 @@ def pin_scenario():
     # Pin current slots and freight share for cargo tab reference
     ss.pinned_slots = int(ss.slots)
     ss.pinned_freight_share = float(ss.freight_share)
-    # Pin current noise scenario as reference for diff
-    if "noise_gdf" in ss and "scenario" in ss.noise_gdf.columns:
-        ss.pinned_noise = ss.noise_gdf['scenario'].copy()
+    # Pin current noise scenario as reference for diff (a reference, not a copy)
+    if "noise" in ss:
+        ss.noise.pin()
 
 
 def unpin_scenario():
@@ -417,8 +358,8 @@ def unpin_scenario():
     ss.pinned_slots = DEFAULT_SLOTS
     ss.pinned_freight_share = DEFAULT_FREIGHT_SHARE
     # Reset noise reference back to baseline
-    if "baseline_noise" in ss:
-        ss.pinned_noise = ss.baseline_noise.copy()
+    if "noise" in ss:
+        ss.noise.pin(baseline_outputs()['levels'])
 
 
 def reset_all():
@@ -433,49 +374,117 @@ def reset_all():
     st.session_state.runway_shares = default_runway_shares()
     st.session_state["form_version"] += 1
     # Reset cargo tab excluded countries
-    if "wgi_excluded" in st.session_state:
-        st.session_state.wgi_excluded = set()
+    if "cargo_selection" in st.session_state:
+        st.session_state.cargo_selection.reset()
+
+
+def baseline_outputs():
+    """Starting-situation outputs, computed once per process (see model.get_baseline)."""
+    return model.get_baseline(get_datasets())
+
 
+def get_cargo_engine():
+    """Process-wide cargo tensors (see model.get_cargo_engine)."""
+    return model.get_cargo_engine(get_datasets())
 
-def combine_lden_df_weighted(df, cols, weights, normalize_weights=True, slots=None):
+
+def combine_lden_df_weighted(df, cols, weights, normalize_weights=True, slots=None, energy=None):
+    """Session wrapper of model.combine_lden_df_weighted; `slots` defaults to the slider value."""
     if slots is None:
         slots = ss.slots
-    w = np.asarray(weights, dtype=float)
-    if normalize_weights:
-        w = w / w.sum()
+    return model.combine_lden_df_weighted(df, cols, weights, slots, normalize_weights=normalize_weights, energy=energy)
 
-    print(w)
 
-    reference = [763, 2058, 1944, 467, 1322, 3110]
+# -----------------------------
+# Diagnostics
+# -----------------------------
 
-    w = [(sum([763, 2058, 1944, 467, 1322, 3110])/478_000)*weight*slots/reference[i] for i, weight in enumerate(w)]
+def debug_enabled(name):
+    """True if `name` is among the ?debug= query parameters (e.g. ?debug=timings)."""
+    return name in st.query_params.get_all("debug")
 
-    print(w)
 
-    L = df[cols].to_numpy(dtype=np.float64, copy=False)   # shape (n_rows, n_cols)
-    # energy per cell:
-    E = 10.0 ** (L / 10.0)
-    # weighted sum per row:
-    Ew = E @ w
-    return 10.0 * np.log10(Ew)
+def begin_timing(name="script"):
+    """Start the timing record of this run (see timing.py), tagged with the session."""
+    ctx = get_script_run_ctx()
+    return timing.begin(name, session=ctx.session_id if ctx else None)
 
-def delta_lden_from_haul_mix(
-    N_short: float, N_med: float, N_long: float,
-    N_short_new: float, N_med_new: float, N_long_new: float,
-    dL_med_minus_short: float = 0.2838603921484293,
-    dL_long_minus_short: float = 1.3974990345316523,
-) -> float:
-    """
-    Same as above but returns only the change in Lden (dB).
-    Useful if you want to apply it to many baseline levels.
-    """
-    rM = 10 ** (dL_med_minus_short / 10.0)
-    rL = 10 ** (dL_long_minus_short / 10.0)
 
-    E_base = N_short + rM * N_med + rL * N_long
-    E_new  = N_short_new + rM * N_med_new + rL * N_long_new
+def timed_run(name):
+    """Decorator: each call is a timing run of its own (a span inside a script run), for fragments."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            ctx = get_script_run_ctx()
+            with timing.run(name, session=ctx.session_id if ctx else None):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
 
-    if E_base <= 0 or E_new <= 0:
-        raise ValueError("Energy totals must be positive. Check slot counts and inputs.")
 
-    return float(10.0 * np.log10(E_new / E_base))
+def timed_plotly_chart(name, fig, **kwargs):
+    """
+    st.plotly_chart in a timing span; the time is mostly the figure's JSON serialisation.
+    With the timings panel on, or MAINPORT_TIMING_BYTES set for the timing log, the span
+    also gets the payload size (serialised once more, outside the span).
+    """
+    with timing.span(f"send {name}") as rec:
+        event = st.plotly_chart(fig, **kwargs)
+    run = timing.current_run()
+    if run is not None and ((run.log and timing.TIMING_BYTES) or debug_enabled("timings")):
+        rec["bytes"] = len(pio.to_json(fig, validate=False))
+    return event
+
+
+def timings_panel(run):
+    """Sidebar table of the spans of `run` so far (?debug=timings)."""
+    with st.sidebar.expander("Timings", expanded=True):
+        if run is None:
+            st.caption("No run recorded.")
+            return
+        st.caption(f"This run: {run.elapsed_ms():,.0f} ms up to here")
+        spans = pd.DataFrame(run.spans, columns=["name", "depth", "ms", "bytes"])
+        spans["name"] = ["\u2003" * d + n for n, d in zip(spans["name"], spans["depth"])]
+        spans["kB"] = spans["bytes"] / 1e3
+        st.dataframe(spans[["name", "ms", "kB"]], hide_index=True,
+                     column_config={"ms": st.column_config.NumberColumn(format="%.1f"),
+                                    "kB": st.column_config.NumberColumn(format="%.0f")})
+        stats = model.get_result_cache(get_datasets()).stats()
+        st.caption(f"Result cache: {stats['entries']} entries, {stats['bytes'] / 1e6:,.1f} MB, "
+                   f"hit rate {stats['hit_rate']:.0%}")
+
+
+def begin_profile(script):
+    """
+    Profile this run from here on with ?debug=profile (sampled flame graph) and/or
+    ?debug=pstats (cProfile); None otherwise. A profiler left running by a run that was
+    cut short is stopped first.
+    """
+    stale = ss.pop("run_profiler", None)
+    if stale is not None:
+        stale.stop()
+    flame, cprofile = debug_enabled("profile"), debug_enabled("pstats")
+    if not (flame or cprofile):
+        return None
+    ss.run_profiler = RunProfiler(flame, cprofile, root_file=script).start()
+    return ss.run_profiler
+
+
+def profile_downloads(profiler):
+    """Stop the profiler of this run and offer its results as sidebar downloads."""
+    if profiler is None:
+        return
+    profiler.stop()
+    ss.pop("run_profiler", None)
+    stamp = pd.Timestamp.now().strftime("%Y%m%d-%H%M%S")
+    with st.sidebar.expander("Profile", expanded=True):
+        st.caption("This run up to here; fragment reruns are not profiled.")
+        if profiler.sampler is not None:
+            title = f"Rerun of {ss.scenario_title}: {ss.slots:,} slots, {float(ss.freight_share):g}% freight"
+            st.download_button("Flame graph (HTML)", profiler.flame_graph(title), file_name=f"profile-{stamp}.html",
+                               mime="text/html", on_click="ignore")
+        if profiler.cprofile is not None:
+            st.download_button("cProfile stats (pstats)", profiler.pstats(), file_name=f"profile-{stamp}.pstats",
+                               mime="application/octet-stream", on_click="ignore")
+            st.caption("cProfile slows Python code down, so its times run high; "
+                       "open with `python -m pstats` or snakeviz.")
@@ -0,0 +1,207 @@
+import os
+import random
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from streamlit import config
+from streamlit.testing.v1 import AppTest, app_test, local_script_runner
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+PERCENTILES = (50, 90, 99)
+
+
+def rss_mb():
+    """Current resident memory of the process (peak RSS where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def share_runtime(script=APP):
+    """
+    Let AppTest sessions run at the same time, sharing one runtime and one compiled
+    script as on a server.
+
+    AppTest installs a mock Runtime when a run starts and removes it when the run ends,
+    which breaks the runs of other sessions still going; its per-run runtime is moved
+    to a subclass here and a single one is installed for everybody. It also compiles
+    the script on every run, and parallel compiles are not safe on every Python version
+    (3.11 for one), so `script` is compiled once up front.
+    Test mode is switched on through config.get_option patches that concurrent runs
+    would undo for each other, so the option itself is set as well.
+    """
+    from unittest.mock import MagicMock
+    from streamlit.components.v2.component_manager import BidiComponentManager
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    config.set_option("global.appTest", True)
+    if app_test.Runtime is not Runtime:
+        return
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    runtime.bidi_component_registry = BidiComponentManager()
+    runtime.bidi_component_registry.discover_and_register_components(start_file_watching=False)
+    Runtime._instance = runtime
+    app_test.Runtime = type("PerRunRuntime", (Runtime,), {})
+    script_cache = ScriptCache()
+    script_cache.get_bytecode(script)
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+
+# -----------------------------
+# Interactions: each changes one input of a session and reruns it
+# -----------------------------
+
+def drag_slots(at, rng):
+    # stepping through values, one rerun per step as in a drag
+    value = at.number_input(key="slots").value
+    for _ in range(3):
+        value = int(np.clip(value + rng.choice([-1, 1]) * rng.randrange(10_000, 60_001, 10_000), 200_000, 900_000))
+        yield "slots input", lambda: at.number_input(key="slots").set_value(value).run()
+
+
+def drag_freight(at, rng):
+    value = at.slider(key="freight_share").value
+    for _ in range(3):
+        value = float(np.clip(value + rng.choice([-2.0, -1.0, 1.0, 2.0]), 0.0, 30.0))
+        yield "freight slider", lambda: at.slider(key="freight_share").set_value(value).run()
+
+
+def submit_runways(at, rng):
+    def submit():
+        for w in at.number_input:
+            if w.key and w.key.startswith("tmp_runway_"):
+                w.set_value(round(rng.uniform(0.0, 1.0), 2))
+        next(b for b in at.button if b.label == "Apply runway shares").click().run()
+    yield "runway form", submit
+
+
+def toggle_pin(at, rng):
+    def click():
+        button = next(b for b in at.button if b.label in ("Pin current scenario", "Unpin"))
+        button.click().run()
+    yield "pin / unpin", click
+
+
+def toggle_countries(at, rng):
+    # AppTest cannot click a plotly map: apply what the click handler does, then rerun
+    selection = at.session_state["cargo_selection"]
+    for _ in range(2):
+        i = rng.randrange(len(selection.excluded))
+        yield "cargo toggle", lambda: (selection.toggle(i), at.run())
+
+
+def switch_colour(at, rng):
+    def switch():
+        radio = at.radio(key="ui_sound")
+        radio.set_value("Lden" if radio.value == "diff" else "diff").run()
+    yield "map colour", switch
+
+
+INTERACTIONS = {
+    drag_slots: 3,
+    drag_freight: 2,
+    submit_runways: 1,
+    toggle_pin: 1,
+    toggle_countries: 2,
+    switch_colour: 1,
+}
+
+
+def session(index, interactions, seed, timeout):
+    """
+    One analyst: start the app, then `interactions` random interactions (weighted as in
+    INTERACTIONS) without think time. Returns (action, seconds) per rerun.
+    """
+    rng = random.Random(seed * 1_000_003 + index)
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    times = []
+    t = time.perf_counter()
+    at.run()
+    times.append(("start", time.perf_counter() - t))
+    for _ in range(interactions):
+        interaction = rng.choices(list(INTERACTIONS), weights=list(INTERACTIONS.values()))[0]
+        for action, rerun in interaction(at, rng):
+            t = time.perf_counter()
+            rerun()
+            times.append((action, time.perf_counter() - t))
+            if at.exception:
+                raise RuntimeError(f"session {index}, {action}: {at.exception[0].message}")
+    return times
+
+
+def run_load(sessions, interactions=10, seed=0, timeout=300):
+    """`sessions` sessions running their scripts at the same time, each in its own thread (as on the server)."""
+    share_runtime()
+    before = rss_mb()
+    barrier = threading.Barrier(sessions)
+
+    def start(i):
+        barrier.wait()
+        return session(i, interactions, seed, timeout)
+
+    t = time.perf_counter()
+    with ThreadPoolExecutor(sessions) as pool:
+        results = list(pool.map(start, range(sessions)))
+    wall = time.perf_counter() - t
+    after = rss_mb()
+    rows = [dict(session=i, action=a, ms=1000 * s) for i, times in enumerate(results) for a, s in times]
+    return pd.DataFrame(rows), dict(sessions=sessions, wall_s=wall, rss_mb=after, rss_growth_mb=after - before)
+
+
+def summarize(df):
+    """Latency percentiles (ms) of a set of reruns."""
+    ms = df["ms"].to_numpy()
+    out = {f"p{p}_ms": np.percentile(ms, p) for p in PERCENTILES}
+    out.update(max_ms=ms.max(), reruns=len(ms))
+    return out
+
+
+def load_report(levels=(1, 2, 4, 8), interactions=10, seed=0):
+    """
+    Interactive reruns (app start excluded) per number of concurrent sessions: latency
+    percentiles, reruns per second over the whole run and process memory afterwards.
+    """
+    rows, per_action = [], []
+    for n in levels:
+        df, info = run_load(n, interactions, seed)
+        reruns = df[df["action"] != "start"]
+        rows.append(dict(info, start_p50_ms=df.loc[df["action"] == "start", "ms"].median(),
+                         **summarize(reruns), reruns_per_s=len(reruns) / info["wall_s"]))
+        for action, g in reruns.groupby("action"):
+            per_action.append(dict(sessions=n, action=action, **summarize(g)))
+    return pd.DataFrame(rows), pd.DataFrame(per_action)
+
+
+if __name__ == "__main__":
+    import argparse
+    from streamlit import logger
+    parser = argparse.ArgumentParser(description="Headless load test: concurrent AppTest sessions on app.py.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8], help="concurrent sessions per level")
+    parser.add_argument("--interactions", type=int, default=10, help="interactions per session")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--by-action", action="store_true", help="also print the percentiles per interaction")
+    args = parser.parse_args()
+
+    # every session outside a real server warns about its missing script run context
+    logger.set_log_level("error")
+    summary, per_action = load_report(args.sessions, args.interactions, args.seed)
+    fmt = lambda x: f"{x:,.1f}"
+    with pd.option_context("display.width", 200):
+        print(summary.to_string(index=False, float_format=fmt))
+        if args.by_action:
+            print()
+            print(per_action.to_string(index=False, float_format=fmt))
@@ -0,0 +1,266 @@
+import sys
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from datasets import DATA_DIR, get_datasets
+from cargo_engine import CargoEngine
+from kpi_engine import KpiEngine, SCENARIO_COLUMNS, whole_inputs
+from noise_engine import NoiseEngine, REFERENCE_COUNTS, REFERENCE_SLOTS, RUNWAYS
+from result_cache import ResultCache
+from sweep import sweep
+
+# -----------------------------
+# Shared default constants (single source of truth)
+# -----------------------------
+DEFAULT_SLOTS = 478_000
+DEFAULT_FREIGHT_SHARE = 5.0
+DEFAULT_PATH = "Hub optimized"
+DEFAULT_RUNWAY_COUNTS = dict(zip(RUNWAYS, REFERENCE_COUNTS))
+# Haul shares (short, medium) of the Custom path when nothing else is given
+DEFAULT_CUSTOM_HAUL = (40, 30)
+# Memory bound of the cross-session scenario result cache
+RESULT_CACHE_BYTES = 64_000_000
+
+
+def normalize_shares(shares, keys):
+    vals = np.array([max(0.0, shares[k]) for k in keys], dtype=float)
+    s = vals.sum()
+
+    if s <= 0:
+        vals[:] = 1.0 / len(vals)
+    else:
+        vals /= s
+
+    return dict(zip(keys, vals))
+
+
+def default_runway_shares():
+    """Return normalised default runway shares (single source of truth)."""
+    return normalize_shares(dict(DEFAULT_RUNWAY_COUNTS), RUNWAYS)
+
+
+def scenario_defaults(path, slots, freight_share, scenarios, haul_dist, custom=DEFAULT_CUSTOM_HAUL):
+    """
+    Default haul shares (percent) for a growth path at `slots`.
+    `custom` is the (short, medium) pair returned for paths without rules (Custom).
+    """
+    if path in ("Hub optimized", "OD optimized"):
+        row = scenarios.loc[path]
+
+        def haul_slots(haul):
+            return (REFERENCE_SLOTS*haul_dist.loc[f'{haul} haul pax']['base_slot_frac'] +
+                max(slots - REFERENCE_SLOTS,0)*row[f'{haul} haul increase']/1000 +
+                max(REFERENCE_SLOTS - slots,0)*row[f'{haul} haul decrease']/1000)
+
+        short = 100*haul_slots('short')/slots
+        medium = 100*haul_slots('medium')/slots
+        long = 100*haul_slots('long')/slots
+
+    else:
+        short, medium = custom
+        long = 100 - short - medium
+
+    return {"short": int(short), "medium": int(medium), "long": int(long)}
+
+
+def combine_lden_df_weighted(df, cols, weights, slots, normalize_weights=True, energy=None):
+    """
+    Combine per-runway Lden columns into one weighted Lden per cell.
+    Pass `energy` (see Datasets.energy) to skip converting `df[cols]` to energy.
+    """
+    w = np.asarray(weights, dtype=float)
+    if normalize_weights:
+        w = w / w.sum()
+
+    reference = list(REFERENCE_COUNTS)
+
+    w = [(sum(reference)/REFERENCE_SLOTS)*weight*slots/reference[i] for i, weight in enumerate(w)]
+
+    if energy is None:
+        L = df[cols].to_numpy(dtype=np.float64, copy=False)   # shape (n_rows, n_cols)
+        # energy per cell:
+        E = 10.0 ** (L / 10.0)
+    else:
+        E = energy
+    # weighted sum per row:
+    Ew = E @ w
+    return 10.0 * np.log10(Ew)
+
+
+@lru_cache(maxsize=None)
+def get_noise_engine(ds):
+    """NoiseEngine per Datasets object; caches runway fields for everyone evaluating on it."""
+    return NoiseEngine(ds.energy, ds.population)
+
+
+@lru_cache(maxsize=None)
+def get_kpi_engine(ds):
+    """KpiEngine per Datasets object; per-slot coefficients are compiled once from its tables."""
+    return KpiEngine(ds.haul_dist, ds.econ_fact)
+
+
+@lru_cache(maxsize=None)
+def get_cargo_engine(ds):
+    """CargoEngine per Datasets object; the cargo tensors are compiled once from its table."""
+    return CargoEngine(ds.cargo_data)
+
+
+def runway_vector(runway_shares=None):
+    """Runway shares in RUNWAYS order from a {runway: share} dict or a sequence (default counts if None)."""
+    if runway_shares is None:
+        runway_shares = DEFAULT_RUNWAY_COUNTS
+    if isinstance(runway_shares, dict):
+        return [runway_shares[r] for r in RUNWAYS]
+    return list(runway_shares)
+
+
+@lru_cache(maxsize=None)
+def get_result_cache(ds):
+    """Scenario result cache per Datasets object, shared by all sessions (see evaluate)."""
+    return ResultCache(max_bytes=RESULT_CACHE_BYTES)
+
+
+def scenario_key(slots, freight_pct, short_pct, medium_pct, long_pct, shares):
+    """Normalised inputs of a scenario; runway shares rounded as for the runway field cache."""
+    return (float(slots or 0), float(freight_pct or 0), float(short_pct or 0), float(medium_pct or 0),
+            float(long_pct or 0), NoiseEngine.shares_key(shares))
+
+
+def _scenario_outputs(ds, shares, slots, freight_pct, short_pct, medium_pct, long_pct):
+    """Everything of a scenario that does not depend on the noise reference (cacheable)."""
+    # Runway field is cached per runway shares; slots and fleet mix are a scalar dB offset
+    engine = get_noise_engine(ds)
+    noise_offset = engine.offset(slots, short_pct, medium_pct, long_pct)
+    levels = engine.field(shares) + noise_offset
+    levels.setflags(write=False)
+
+    # Economic KPIs: segment slots × per-slot coefficient matrix (compiled once per datasets)
+    scenario = whole_inputs([slots or 0, freight_pct or 0, short_pct or 0, medium_pct or 0])
+    long_pct = max(0, 100 - int(scenario[0, 2]) - int(scenario[0, 3]))
+    kpi_engine = get_kpi_engine(ds)
+    econ = {k: float(v[0]) for k, v in kpi_engine.evaluate(scenario).items()}
+
+    # Thresholds on the scenario level: one searchsorted on the sorted runway field
+    noise_index = engine.index(shares)
+
+    return dict(
+        long_pct=long_pct,
+        seg=kpi_engine.segment_table(scenario),
+        va_direct=econ['va_direct'],
+        va_indirect=econ['va_indirect'],
+        jobs_direct=int(econ['jobs_direct']),
+        jobs_indirect=int(econ['jobs_indirect']),
+        total_cargo_freight = econ['total_cargo_freight'],
+        total_cargo_belly = econ['total_cargo_belly'],
+        total_pax = econ['total_pax'],
+        pop_above45 = int(noise_index.pop_above(45, noise_offset)),
+        pop_above50 = int(noise_index.pop_above(50, noise_offset)),
+        netwerkbreedte = econ['netwerkbreedte'],
+        netwerkdiepte = econ['netwerkdiepte'],
+        exposure = noise_index.exposure_curve(noise_offset),
+        levels = levels,
+    )
+
+
+def evaluate(slots, freight_pct, short_pct, medium_pct, long_pct, runway_shares=None, ds=None,
+             reference=None, cache=True):
+    """
+    KPIs, segment table and noise levels of one scenario, without side effects.
+
+    `reference` is the Lden per cell the `diff` / `homes` outputs compare against
+    (default: the baseline field of `ds`). Besides the dashboard KPIs the result holds
+    the arrays `levels` (scenario Lden per cell) and `diff`; nothing in `ds` is modified.
+
+    With `cache`, everything but `diff` and `homes` comes from the process-wide result
+    cache, so the returned `seg`, `exposure` and `levels` are shared: do not modify them.
+    """
+    ds = ds or get_datasets()
+    shares = runway_vector(runway_shares)
+    inputs = (slots, freight_pct, short_pct, medium_pct, long_pct)
+    if cache:
+        out = get_result_cache(ds).get_or_compute(
+            scenario_key(*inputs, shares), lambda: _scenario_outputs(ds, shares, *inputs))
+    else:
+        out = _scenario_outputs(ds, shares, *inputs)
+
+    out = dict(out)
+    out['diff'] = out['levels'] - np.asarray(ds.normal if reference is None else reference, dtype=np.float64)
+    # diff is against an arbitrary reference field, so this one still needs a mask
+    out['homes'] = int(ds.population[out['diff'] < -1].sum())
+    return out
+
+
+@lru_cache(maxsize=None)
+def get_baseline(ds):
+    """
+    Starting situation: the DEFAULT_* scenario on `ds`, evaluated once and shared
+    read-only by everyone (diff / homes against the baseline field).
+    """
+    haul = scenario_defaults(DEFAULT_PATH, DEFAULT_SLOTS, DEFAULT_FREIGHT_SHARE, ds.scenarios, ds.haul_dist)
+    out = evaluate(DEFAULT_SLOTS, DEFAULT_FREIGHT_SHARE, haul["short"], haul["medium"], haul["long"], ds=ds)
+    out["diff"].setflags(write=False)
+    return out
+
+
+def complete_scenarios(table, ds=None):
+    """
+    Fill in the optional columns of a scenario table: slots, freight_pct and path get the
+    dashboard defaults, and missing short_pct / medium_pct follow from the path defaults.
+    """
+    ds = ds or get_datasets()
+    df = table.copy()
+    for col, default in (("slots", DEFAULT_SLOTS), ("freight_pct", DEFAULT_FREIGHT_SHARE), ("path", DEFAULT_PATH)):
+        df[col] = df[col].fillna(default) if col in df.columns else default
+    for col in ("short_pct", "medium_pct"):
+        if col not in df.columns:
+            df[col] = np.nan
+    missing = df["short_pct"].isna() | df["medium_pct"].isna()
+    for i in np.flatnonzero(missing.to_numpy()):
+        row = df.iloc[i]
+        d = scenario_defaults(row["path"], row["slots"], row["freight_pct"], ds.scenarios, ds.haul_dist)
+        df.iloc[i, df.columns.get_loc("short_pct")] = d["short"]
+        df.iloc[i, df.columns.get_loc("medium_pct")] = d["medium"]
+    return df
+
+
+def evaluate_batch(table, ds=None, reference=None):
+    """KPIs for every row of a scenario table (see complete_scenarios for the columns)."""
+    ds = ds or get_datasets()
+    return sweep(complete_scenarios(table, ds), ds=ds, reference=reference)
+
+
+def read_scenarios(path):
+    if path.endswith((".xlsx", ".xls")):
+        return pd.read_excel(path)
+    if path.endswith(".json"):
+        return pd.read_json(path)
+    return pd.read_csv(path)
+
+
+def write_results(df, path):
+    if path is None or path == "-":
+        df.to_csv(sys.stdout, index=False)
+    elif path.endswith(".xlsx"):
+        df.to_excel(path, index=False)
+    elif path.endswith(".json"):
+        df.to_json(path, orient="records", indent=1)
+    else:
+        df.to_csv(path, index=False)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Evaluate a file of scenarios headless.",
+        epilog=f"Columns: {', '.join(SCENARIO_COLUMNS)} and path, optional with the dashboard "
+               f"defaults; runway shares in one column per runway ({', '.join(RUNWAYS)}), "
+               f"all of them or none for the default split.",
+    )
+    parser.add_argument("scenarios", help="scenario table (.csv, .xlsx or .json)")
+    parser.add_argument("-o", "--output", help="result file (.csv, .xlsx or .json); stdout if omitted")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    args = parser.parse_args()
+
+    write_results(evaluate_batch(read_scenarios(args.scenarios), get_datasets(args.data_dir)), args.output)
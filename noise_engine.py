@@ -0,0 +1,176 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Per-runway Lden layers and the reference runway movements / slot count they were
+# computed for (same order as DEFAULT_RUNWAY_COUNTS in functions_app).
+LDEN_COLS = [
+    "Lden_Polderbaan",
+    "Lden_Zwanenburgbaan",
+    "Lden_Buitenveldertbaan",
+    "Lden_Oostbaan",
+    "Lden_Aalsmeerbaan",
+    "Lden_Kaagbaan",
+]
+# Runway names, in LDEN_COLS order
+RUNWAYS = [c[len("Lden_"):] for c in LDEN_COLS]
+REFERENCE_COUNTS = (763, 2058, 1944, 467, 1322, 3110)
+REFERENCE_SLOTS = 478_000
+# Fleet mix (short, medium, long) the Lden layers represent
+REFERENCE_HAUL_MIX = (0.40, 0.35, 0.25)
+# Per-movement Lden of medium and long haul relative to short haul (dB)
+DL_MED_MINUS_SHORT = 0.2838603921484293
+DL_LONG_MINUS_SHORT = 1.3974990345316523
+
+
+def delta_lden_from_haul_mix(
+    N_short: float, N_med: float, N_long: float,
+    N_short_new: float, N_med_new: float, N_long_new: float,
+    dL_med_minus_short: float = DL_MED_MINUS_SHORT,
+    dL_long_minus_short: float = DL_LONG_MINUS_SHORT,
+) -> float:
+    """
+    Change in Lden (dB) when the haul mix moves from the base to the new slot counts.
+    Useful if you want to apply it to many baseline levels.
+    """
+    rM = 10 ** (dL_med_minus_short / 10.0)
+    rL = 10 ** (dL_long_minus_short / 10.0)
+
+    E_base = N_short + rM * N_med + rL * N_long
+    E_new  = N_short_new + rM * N_med_new + rL * N_long_new
+
+    if E_base <= 0 or E_new <= 0:
+        raise ValueError("Energy totals must be positive. Check slot counts and inputs.")
+
+    return float(10.0 * np.log10(E_new / E_base))
+
+
+class ExposureIndex:
+    """
+    Cells sorted by level with a suffix sum of their population.
+
+    Population above any threshold is one searchsorted; since slots and fleet mix only
+    shift all levels by the same offset, one index serves every scenario on a runway field.
+    """
+
+    def __init__(self, levels, population):
+        order = np.argsort(levels, kind="stable")
+        self.levels = np.asarray(levels)[order]
+        pop = np.asarray(population, dtype=np.int64)[order]
+        # above[i] = population of sorted cells i..n-1; above[n] = 0
+        self.above = np.append(np.cumsum(pop[::-1])[::-1], 0)
+
+    def pop_above(self, threshold, offset=0.0):
+        """Population in cells with level + offset > threshold (scalar or array of thresholds)."""
+        i = np.searchsorted(self.levels, np.asarray(threshold) - offset, side="right")
+        return self.above[i]
+
+    def pop_below(self, threshold, offset=0.0):
+        """Population in cells with level + offset < threshold."""
+        i = np.searchsorted(self.levels, np.asarray(threshold) - offset, side="left")
+        return self.above[0] - self.above[i]
+
+    def exposure_curve(self, offset=0.0, lo=40.0, hi=70.0, step=0.5):
+        """Population above each threshold from `lo` to `hi` dB."""
+        thresholds = np.arange(lo, hi + step / 2, step)
+        return pd.DataFrame({"threshold": thresholds, "population": self.pop_above(thresholds, offset)})
+
+
+class NoiseEngine:
+    """
+    Scenario noise levels from a per-runway energy matrix (cells × runways).
+
+    A scenario level splits into a field that only depends on the runway shares and a
+    scalar dB offset for slots and fleet mix:
+
+        L = 10·log10(E @ (w / ref)) + 10·log10(Σref · slots / 478k) + ΔL_fleetmix
+
+    The runway field is cached per (normalised) share vector, so slot, freight and haul
+    changes cost one scalar add instead of the O(cells × runways) mat-vec.
+    """
+
+    def __init__(self, energy, population=None, reference=REFERENCE_COUNTS, max_fields=32):
+        self.energy = energy
+        self.population = population
+        self.reference = np.asarray(reference, dtype=np.float64)
+        self.max_fields = max_fields
+        self._fields = OrderedDict()
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, store, key, build):
+        with self._lock:
+            v = store.get(key)
+            if v is not None:
+                store.move_to_end(key)
+                return v
+        v = build()
+        with self._lock:
+            store[key] = v
+            while len(store) > self.max_fields:
+                store.popitem(last=False)
+        return v
+
+    @staticmethod
+    def normalise(shares):
+        """Runway shares clipped at 0 and scaled to sum to 1 (uniform if all zero)."""
+        w = np.clip(np.asarray(shares, dtype=np.float64), 0.0, None)
+        s = w.sum()
+        return w / s if s > 0 else np.full(len(w), 1.0 / len(w))
+
+    @staticmethod
+    def shares_key(shares, ndigits=9):
+        """Normalised, rounded runway shares; used as cache key for the runway field."""
+        return tuple(round(float(x), ndigits) for x in NoiseEngine.normalise(shares))
+
+    def field(self, shares):
+        """Runway-weighted level (dB) for `shares`, before the slot/fleet-mix offset. Read-only."""
+        def build():
+            f = 10.0 * np.log10(self.energy @ (self.normalise(shares) / self.reference))
+            f.setflags(write=False)
+            return f
+        return self._cached(self._fields, self.shares_key(shares), build)
+
+    def fields(self, shares):
+        """Runway fields for many share vectors at once: rows of `shares` → array (cells, n).
+        One energy × weight-matrix product; not cached.
+        """
+        W = np.clip(np.atleast_2d(np.asarray(shares, dtype=np.float64)), 0.0, None)
+        s = W.sum(axis=1, keepdims=True)
+        W = np.divide(W, s, out=np.full_like(W, 1.0 / W.shape[1]), where=s > 0)
+        return 10.0 * np.log10(self.energy @ (W / self.reference).T)
+
+    def index(self, shares):
+        """ExposureIndex on the runway field for `shares` (needs `population`)."""
+        if self.population is None:
+            raise ValueError("NoiseEngine was built without a population vector.")
+        return self._cached(self._indexes, self.shares_key(shares),
+                            lambda: ExposureIndex(self.field(shares), self.population))
+
+    def offset(self, slots, short_pct=None, medium_pct=None, long_pct=None):
+        """Scalar dB shift for the slot count and (optionally) the haul mix in percent."""
+        off = 10.0 * np.log10(self.reference.sum() * slots / REFERENCE_SLOTS)
+        if short_pct is not None:
+            off += delta_lden_from_haul_mix(*(f * slots for f in REFERENCE_HAUL_MIX),
+                                            short_pct/100 * slots,
+                                            medium_pct/100 * slots,
+                                            long_pct/100 * slots)
+        return float(off)
+
+    def offsets(self, slots, short_pct, medium_pct, long_pct):
+        """Vectorised offset() for arrays of scenarios (haul mix in percent)."""
+        slots = np.asarray(slots, dtype=np.float64)
+        rM = 10 ** (DL_MED_MINUS_SHORT / 10.0)
+        rL = 10 ** (DL_LONG_MINUS_SHORT / 10.0)
+        s, m, l = REFERENCE_HAUL_MIX
+        E_base = s + rM * m + rL * l
+        E_new = (np.asarray(short_pct) + rM * np.asarray(medium_pct) + rL * np.asarray(long_pct)) / 100
+        if np.any(E_new <= 0):
+            raise ValueError("Energy totals must be positive. Check slot counts and inputs.")
+        return 10.0 * np.log10(self.reference.sum() * slots / REFERENCE_SLOTS) + 10.0 * np.log10(E_new / E_base)
+
+    def levels(self, shares, slots, short_pct=None, medium_pct=None, long_pct=None):
+        """Scenario Lden per cell: cached runway field plus the scalar offset."""
+        return self.field(shares) + self.offset(slots, short_pct, medium_pct, long_pct)
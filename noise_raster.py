@@ -0,0 +1,110 @@
+import base64
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import shapely
+from PIL import Image
+
+# Web Mercator is what the basemap uses; an image layer is stretched linearly in it
+_MAX_LAT = 85.05112878
+
+
+def _merc_y(lat):
+    lat = np.clip(lat, -_MAX_LAT, _MAX_LAT)
+    return np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+
+
+def _inv_merc_y(y):
+    return np.degrees(2 * np.arctan(np.exp(y)) - np.pi / 2)
+
+
+class CellRaster:
+    """
+    Pixel → cell lookup for drawing a per-cell field as an image overlay.
+
+    Built once per geometry: every pixel centre is located in (at most) one polygon.
+    Rasterising a scenario is then a single fancy-index of per-cell colours.
+    """
+
+    def __init__(self, geometry, width=800):
+        minx, miny, maxx, maxy = shapely.total_bounds(geometry)
+        y0, y1 = _merc_y(miny), _merc_y(maxy)
+        x_span = np.radians(maxx - minx)
+        height = max(1, int(round(width * (y1 - y0) / x_span)))
+        lons = minx + (np.arange(width) + 0.5) * (maxx - minx) / width
+        # rows run top (north) to bottom (south), equally spaced in mercator y
+        lats = _inv_merc_y(y1 - (np.arange(height) + 0.5) * (y1 - y0) / height)
+        points = shapely.points(np.repeat(lons[None, :], height, 0).ravel(),
+                                np.repeat(lats[:, None], width, 1).ravel())
+        tree = shapely.STRtree(geometry)
+        pix, cell = tree.query(points, predicate="within")
+        # -1 = no cell; indexes the transparent colour appended in rasterise()
+        index = np.full(width * height, -1, dtype=np.int32)
+        index[pix] = cell
+        self.index = index.reshape(height, width)
+        self.index.setflags(write=False)
+        self.n_cells = len(geometry)
+        # image corners for the map layer: top-left, top-right, bottom-right, bottom-left
+        self.coordinates = [[minx, maxy], [maxx, maxy], [maxx, miny], [minx, miny]]
+
+    def rasterise(self, cell_rgba):
+        """RGBA image (h, w, 4) from per-cell colours (n_cells, 4)."""
+        lut = np.vstack([cell_rgba, np.zeros((1, 4), dtype=np.uint8)])
+        return lut[self.index]
+
+
+def colour_scale(values, colours, zmid=None):
+    """Map values onto a linear colour scale (list of RGB tuples); returns (rgba, zmin, zmax)."""
+    values = np.asarray(values, dtype=np.float64)
+    finite = values[np.isfinite(values)]
+    zmin, zmax = (finite.min(), finite.max()) if len(finite) else (0.0, 1.0)
+    if zmid is not None:
+        half = max(abs(zmax - zmid), abs(zmid - zmin))
+        zmin, zmax = zmid - half, zmid + half
+    if zmax <= zmin:
+        # constant field: widen around it (as Plotly does), so it gets the middle colour
+        centre = zmin if zmid is None else zmid
+        zmin, zmax = centre - 0.5, centre + 0.5
+    t = (values - zmin) / (zmax - zmin)
+    t = np.nan_to_num(np.clip(t, 0, 1)) * (len(colours) - 1)
+    lo = np.minimum(t.astype(int), len(colours) - 2)
+    frac = (t - lo)[:, None]
+    c = np.asarray(colours, dtype=np.float64)
+    rgb = c[lo] * (1 - frac) + c[lo + 1] * frac
+    alpha = np.where(np.isfinite(values), 255, 0)[:, None]
+    return np.hstack([rgb, alpha]).astype(np.uint8), float(zmin), float(zmax)
+
+
+def png_data_uri(rgba):
+    buf = io.BytesIO()
+    Image.fromarray(rgba, mode="RGBA").save(buf, format="PNG", optimize=False)
+    return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+class RasterCache:
+    """LRU of rendered overlays keyed by (geometry, colour settings, value hash)."""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts, values):
+        digest = hashlib.blake2b(np.ascontiguousarray(values, dtype=np.float64).tobytes(), digest_size=16)
+        return parts + (digest.hexdigest(),)
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        item = render()
+        with self._lock:
+            self._items[key] = item
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return item
@@ -0,0 +1,146 @@
+import os
+import time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from datasets import Datasets, get_datasets
+from noise_engine import RUNWAYS
+from sweep import runway_allocations, sweep
+
+# Arrays of Datasets that go to shared memory; the parameter tables are small and pickled
+SHARED_ARRAYS = ("energy", "population", "normal")
+SHARED_TABLES = ("haul_dist", "econ_fact")
+
+# Set in each worker by _attach: the datasets view on shared memory (plus the segments,
+# which must stay referenced for as long as the arrays are used)
+_worker_ds = None
+_worker_shm = []
+
+
+def _to_shared(arrays):
+    """Copy arrays into new shared memory segments; returns (segments, spec for attaching)."""
+    segments, spec = [], {}
+    for name, a in arrays.items():
+        a = np.ascontiguousarray(a)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, a.nbytes))
+        np.ndarray(a.shape, a.dtype, buffer=shm.buf)[...] = a
+        segments.append(shm)
+        spec[name] = (shm.name, a.shape, a.dtype.str)
+    return segments, spec
+
+
+def _attach(spec, tables):
+    """Worker initializer: read-only array views on the parent's segments, no copies."""
+    global _worker_ds
+    arrays = {}
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _worker_shm.append(shm)
+        a = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+        a.setflags(write=False)
+        arrays[name] = a
+    _worker_ds = Datasets(noise_gdf=None, scenarios=None, cargo_data=None, **arrays, **tables)
+
+
+def _sweep_chunk(scenarios, reference):
+    return sweep(scenarios, ds=_worker_ds, reference=reference)
+
+
+def _started(_):
+    time.sleep(0.05)
+    return os.getpid()
+
+
+class ParallelSweep:
+    """
+    sweep() over a process pool. The noise arrays are put in shared memory once per
+    executor and every worker maps them; only scenario chunks and results are pickled.
+
+        with ParallelSweep(workers=4) as ex:
+            out = ex.sweep(scenario_grid(...))
+    """
+
+    def __init__(self, ds=None, workers=None):
+        ds = ds or get_datasets()
+        self.workers = workers or os.cpu_count() or 1
+        self._segments, spec = _to_shared({k: getattr(ds, k) for k in SHARED_ARRAYS})
+        tables = {k: getattr(ds, k) for k in SHARED_TABLES}
+        # spawn: workers start clean (no inherited Streamlit state) on every platform
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=mp.get_context("spawn"),
+                                         initializer=_attach, initargs=(spec, tables))
+
+    def warm(self):
+        """Start and initialise every worker process (so timings exclude the start-up)."""
+        return set(self._pool.map(_started, range(self.workers * 2)))
+
+    def sweep(self, scenarios, reference=None, chunks_per_worker=4):
+        """Same result as sweep(scenarios), computed in chunks across the pool."""
+        n_chunks = max(1, min(len(scenarios), self.workers * chunks_per_worker))
+        # Rows of one (normalised) runway allocation go to the same chunk, so each field
+        # is computed once
+        order = np.lexsort(runway_allocations(scenarios).T[::-1])
+        parts = [scenarios.iloc[idx] for idx in np.array_split(order, n_chunks) if len(idx)]
+        results = self._pool.map(_sweep_chunk, parts, [reference] * len(parts))
+        # chunks hold the rows in `order`; put them back in input order
+        return pd.concat(results).iloc[np.argsort(order, kind="stable")]
+
+    def close(self):
+        self._pool.shutdown()
+        for shm in self._segments:
+            shm.close()
+            shm.unlink()
+        self._segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def scaling_report(scenarios, workers=(1, 2, 4, 8), ds=None, repeat=3):
+    """
+    Wall time of a sweep on pools of increasing size against the single-process sweep.
+    Efficiency = serial time / (workers × parallel time); pool start-up is excluded.
+    """
+    ds = ds or get_datasets()
+
+    def best(fn):
+        times = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t)
+        return min(times)
+
+    serial = best(lambda: sweep(scenarios, ds=ds))
+    rows = [dict(workers=0, seconds=serial)]
+    for n in workers:
+        with ParallelSweep(ds, workers=n) as ex:
+            ex.warm()
+            rows.append(dict(workers=n, seconds=best(lambda: ex.sweep(scenarios))))
+    df = pd.DataFrame(rows)
+    df["scenarios_per_s"] = len(scenarios) / df["seconds"]
+    df["speedup"] = serial / df["seconds"]
+    df["efficiency"] = df["speedup"] / df["workers"].where(df["workers"] > 0, 1)
+    return df
+
+
+if __name__ == "__main__":
+    import argparse
+    from sweep import scenario_grid
+    parser = argparse.ArgumentParser(description="Scaling of the parallel scenario sweep (workers=0: serial sweep).")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--step", type=float, default=0.1, help="runway-share simplex step on the three busiest runways")
+    args = parser.parse_args()
+
+    steps = np.arange(0, 1 + args.step / 2, args.step)
+    allocations = [dict(zip(RUNWAYS, (0.05, 0.05, a, 0.05, b, 1 - a - b))) for a in steps for b in steps if a + b <= 1 + 1e-9]
+    grid = scenario_grid(slots=range(300_000, 700_001, 50_000), freight_pct=range(2, 21, 3),
+                         short_pct=[35, 40, 45], medium_pct=[30, 35], runway_shares=allocations)
+    print(f"{len(grid):,} scenarios, {len(allocations)} runway allocations, {os.cpu_count()} CPUs")
+    print(scaling_report(grid, workers=args.workers).to_string(index=False, float_format=lambda x: f"{x:,.3f}"))
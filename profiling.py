@@ -0,0 +1,191 @@
+import cProfile
+import html
+import json
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Seconds between stack samples; the interpreter switches threads every few ms anyway
+SAMPLE_INTERVAL = 0.002
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Sampling profiler for one thread: a background thread records the call stack of
+    `thread_id` (default: the calling thread) every `interval` seconds, weighted by the
+    time since the previous sample. Low overhead, so the proportions stay realistic.
+
+    With `root_file`, stacks start at the outermost frame of that file (e.g. the app
+    script, leaving out the framework frames above it) and samples outside it are dropped.
+    """
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL, root_file=None):
+        self.thread_id = threading.get_ident() if thread_id is None else thread_id
+        self.interval = interval
+        self.root_file = os.path.abspath(root_file) if root_file else None
+        self.stacks = Counter()    # (root, ..., leaf) labels -> seconds
+        self.samples = 0
+        self.seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.seconds = time.perf_counter() - self._start
+        return self
+
+    def _run(self):
+        last = time.perf_counter()
+        labels = {}   # code object -> label
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                break
+            stack, root = [], None
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(code)
+                stack.append(label)
+                if self.root_file is not None and os.path.abspath(code.co_filename) == self.root_file:
+                    root = len(stack)
+                frame = frame.f_back
+            del frame
+            if self.root_file is not None:
+                stack = stack[:root] if root is not None else None
+            if stack:
+                self.stacks[tuple(reversed(stack))] += now - last
+            self.samples += 1
+            last = now
+
+
+def flame_tree(stacks, root="all"):
+    """Nested {name, value, children} (value in ms, inclusive) from sampled stacks."""
+    tree = dict(name=root, value=0.0, children={})
+    for stack, seconds in stacks.items():
+        node = tree
+        node["value"] += 1000 * seconds
+        for label in stack:
+            node = node["children"].setdefault(label, dict(name=label, value=0.0, children={}))
+            node["value"] += 1000 * seconds
+
+    def as_lists(node):
+        children = sorted(node["children"].values(), key=lambda c: -c["value"])
+        return dict(name=node["name"], value=round(node["value"], 3), children=[as_lists(c) for c in children])
+    return as_lists(tree)
+
+
+_FLAME_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ font: 12px sans-serif; margin: 12px; }}
+#graph {{ position: relative; }}
+.f {{ position: absolute; height: 17px; box-sizing: border-box; border: 1px solid #fff; overflow: hidden;
+      white-space: nowrap; padding-left: 3px; line-height: 15px; cursor: pointer; }}
+</style></head>
+<body>
+<h3>{title}</h3>
+<p>{subtitle} Click a frame to zoom in, click the top bar to zoom out.</p>
+<div id="graph"></div>
+<script>
+const data = {data};
+const graph = document.getElementById("graph");
+function colour(name) {{
+  let h = 0;
+  for (const c of name) h = (h * 31 + c.charCodeAt(0)) % 360;
+  return `hsl(${{20 + h % 40}}, 80%, ${{60 + h % 20}}%)`;
+}}
+function draw(focus) {{
+  graph.innerHTML = "";
+  const width = graph.clientWidth, scale = width / focus.value;
+  let depth = 0;
+  function add(node, x, level) {{
+    const w = node.value * scale;
+    if (w < 1) return;
+    depth = Math.max(depth, level);
+    const div = document.createElement("div");
+    div.className = "f";
+    div.style.left = x + "px"; div.style.top = (level * 17) + "px"; div.style.width = w + "px";
+    div.style.background = colour(node.name);
+    div.textContent = node.name;
+    div.title = `${{node.name}}\\n${{node.value.toFixed(1)}} ms (${{(100 * node.value / data.value).toFixed(1)}} %)`;
+    div.onclick = () => draw(node === focus ? data : node);
+    graph.appendChild(div);
+    let cx = x;
+    for (const c of node.children) {{ add(c, cx, level + 1); cx += c.value * scale; }}
+  }}
+  add(focus, 0, 0);
+  graph.style.height = ((depth + 1) * 17) + "px";
+}}
+draw(data);
+window.onresize = () => draw(data);
+</script>
+</body></html>
+"""
+
+
+def flame_graph_html(stacks, title="Profile", subtitle=""):
+    """Self-contained HTML flame graph (no external scripts) of sampled stacks."""
+    data = json.dumps(flame_tree(stacks)).replace("</", "<\\/")
+    return _FLAME_PAGE.format(title=html.escape(title), subtitle=html.escape(subtitle), data=data)
+
+
+def pstats_bytes(profile):
+    """A stopped cProfile.Profile in the pstats file format (load with pstats.Stats(path))."""
+    profile.create_stats()
+    return marshal.dumps(profile.stats)
+
+
+class RunProfiler:
+    """
+    Profile the rest of the calling thread's work until stop(): sampled stacks for a
+    flame graph and/or a deterministic cProfile (which slows Python code down noticeably).
+    """
+
+    def __init__(self, flame=True, cprofile=False, root_file=None):
+        self.sampler = StackSampler(root_file=root_file) if flame else None
+        self.cprofile = cProfile.Profile() if cprofile else None
+        self.running = False
+
+    def start(self):
+        if self.sampler is not None:
+            self.sampler.start()
+        if self.cprofile is not None:
+            self.cprofile.enable()
+        self.running = True
+        return self
+
+    def stop(self):
+        if not self.running:
+            return self
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        if self.sampler is not None:
+            self.sampler.stop()
+        self.running = False
+        return self
+
+    def flame_graph(self, title="Profile"):
+        s = self.sampler
+        subtitle = f"{s.seconds * 1000:,.0f} ms, {s.samples:,} samples every {s.interval * 1000:g} ms."
+        return flame_graph_html(s.stacks, title, subtitle)
+
+    def pstats(self):
+        return pstats_bytes(self.cprofile)
@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from datasets import nbytes
+
+# Rough size of a small Python object (int, float, dict slot) in an entry
+_SCALAR_BYTES = 64
+
+
+def entry_size(value):
+    """Approximate bytes held by a cached result: arrays and tables by content, the rest flat."""
+    if isinstance(value, dict):
+        return sum(entry_size(v) for v in value.values()) + _SCALAR_BYTES * len(value)
+    if isinstance(value, (np.ndarray, pd.DataFrame)):
+        return nbytes(value)
+    return _SCALAR_BYTES
+
+
+class ResultCache:
+    """
+    Byte-bounded LRU of scenario results, shared by every session in the process.
+
+    Values must be treated as read-only by callers: the same objects are handed to
+    every session that asks for the key.
+    """
+
+    def __init__(self, max_bytes=64_000_000):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()   # key -> (value, size)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value):
+        size = entry_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, s) = self._items.popitem(last=False)
+                self._bytes -= s
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return dict(
+                entries=len(self._items),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                hits=self.hits,
+                misses=self.misses,
+                hit_rate=self.hits / lookups if lookups else 0.0,
+            )
@@ -0,0 +1,115 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from datasets import get_datasets
+from kpi_engine import KpiEngine, SCENARIO_COLUMNS, whole_inputs
+from noise_engine import NoiseEngine, ExposureIndex, REFERENCE_COUNTS, RUNWAYS
+
+NOISE_THRESHOLDS = (45, 50)
+# Scenarios per runway allocation from which sorting the field beats dense masking
+SORTED_INDEX_MIN = 16
+# Memory budget of one block of cells × (allocations or scenarios) float64 levels
+BLOCK_BYTES = 64_000_000
+
+
+def scenario_grid(runway_shares=None, **axes):
+    """
+    Cartesian product of input axes as a scenario table, e.g.
+    scenario_grid(slots=range(200_000, 750_001, 10_000), freight_pct=range(2, 25),
+                  short_pct=[40], medium_pct=[35], runway_shares=[{...}, {...}]).
+    `runway_shares` is a list of {runway: share} dicts, crossed with the other axes.
+    """
+    df = pd.DataFrame(list(itertools.product(*axes.values())), columns=list(axes))
+    if runway_shares:
+        df = df.merge(pd.DataFrame(runway_shares, columns=RUNWAYS).fillna(0.0), how="cross")
+    return df
+
+
+def runway_allocations(scenarios):
+    """
+    Normalised runway shares per scenario, array (n, runways), rounded as the runway
+    field cache key: equal rows share a field. Default runway counts without share columns.
+    """
+    if set(RUNWAYS).issubset(scenarios.columns):
+        W = np.clip(scenarios[RUNWAYS].to_numpy(dtype=np.float64), 0.0, None)
+    else:
+        W = np.tile(np.asarray(REFERENCE_COUNTS, dtype=np.float64), (len(scenarios), 1))
+    s = W.sum(axis=1, keepdims=True)
+    W = np.divide(W, s, out=np.full_like(W, 1.0 / W.shape[1]), where=s > 0)
+    return W.round(9)
+
+
+def sweep(scenarios, ds=None, reference=None, chunk=None, block_bytes=BLOCK_BYTES):
+    """
+    KPIs for a table of scenarios, fully vectorised.
+
+    `scenarios` needs SCENARIO_COLUMNS (slots, freight_pct, short_pct, medium_pct; long haul
+    is the remainder) and may have one column per runway with its share (normalised per row;
+    default runway counts when absent). `reference` is the Lden per cell the `homes` KPI
+    compares against (default: the baseline field). As in model.evaluate, the economic
+    KPIs are taken at whole slots and percentages (see whole_inputs), the noise KPIs at
+    the exact inputs.
+
+    Economic KPIs are one product with the coefficient matrix. For noise, scenarios are
+    grouped by runway allocation: the fields of `chunk` allocations come from one
+    energy × weight-matrix product, and the population KPIs of every scenario on an
+    allocation are a searchsorted on that field's sorted index. `chunk` (default) and
+    the masked blocks of allocations with few scenarios are sized so one cells × columns
+    block of levels stays within `block_bytes`; peak memory is a small multiple of it.
+    """
+    ds = ds or get_datasets()
+    X = scenarios[SCENARIO_COLUMNS].to_numpy(dtype=np.float64)
+    out = scenarios.copy()
+    econ = KpiEngine(ds.haul_dist, ds.econ_fact).evaluate(whole_inputs(X))
+    for k, v in econ.items():
+        out[k] = v
+    out["jobs_direct"] = out["jobs_direct"].astype(int)
+    out["jobs_indirect"] = out["jobs_indirect"].astype(int)
+
+    noise = NoiseEngine(ds.energy, ds.population)
+    allocations, group = np.unique(runway_allocations(scenarios), axis=0, return_inverse=True)
+    group = group.ravel()
+
+    slots, short, medium = X[:, 0], X[:, 2], X[:, 3]
+    offsets = noise.offsets(slots, short, medium, np.maximum(0, 100 - short - medium))
+    ref = ds.normal if reference is None else np.asarray(reference, dtype=np.float64)
+
+    # columns of cells × n float64 levels that fit in the block budget
+    block = max(1, block_bytes // (8 * len(ref)))
+    chunk = chunk or block
+
+    pop = ds.population.astype(np.float64)
+    pop_above = {t: np.zeros(len(X), dtype=np.int64) for t in NOISE_THRESHOLDS}
+    homes = np.zeros(len(X), dtype=np.int64)
+    order = np.argsort(group, kind="stable")
+    bounds = np.searchsorted(group[order], np.arange(len(allocations) + 1))
+    for a in range(0, len(allocations), chunk):
+        F = noise.fields(allocations[a:a + chunk])
+        sizes = np.diff(bounds[a:a + F.shape[1] + 1])
+        # Allocations with few scenarios: masked population sums on the gathered levels
+        small = np.flatnonzero(sizes < SORTED_INDEX_MIN)
+        if len(small):
+            small_rows = np.concatenate([order[bounds[a + j]:bounds[a + j + 1]] for j in small])
+            for b in range(0, len(small_rows), block):
+                rows = small_rows[b:b + block]
+                L = F[:, group[rows] - a]
+                L += offsets[rows]
+                for t in NOISE_THRESHOLDS:
+                    pop_above[t][rows] = np.rint(pop @ (L > t))
+                L -= ref[:, None]
+                homes[rows] = np.rint(pop @ (L < -1))
+        # Many scenarios on one allocation: sort the field once, searchsorted per scenario
+        for j in np.flatnonzero(sizes >= SORTED_INDEX_MIN):
+            rows = order[bounds[a + j]:bounds[a + j + 1]]
+            index = ExposureIndex(F[:, j], ds.population)
+            for t in NOISE_THRESHOLDS:
+                pop_above[t][rows] = index.pop_above(t, offsets[rows])
+            # diff = level - reference < -1  ⇔  (field - reference) < -1 - offset
+            homes[rows] = ExposureIndex(F[:, j] - ref, ds.population).pop_below(-1, offsets[rows])
+
+    out["homes"] = homes
+    for t in NOISE_THRESHOLDS:
+        out[f"pop_above{t}"] = pop_above[t]
+    return out
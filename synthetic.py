@@ -0,0 +1,220 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from cargo_engine import CARGO_CATEGORIES, MOVEMENT_COLS, TON_COLS
+from datasets import DATA_DIR, NOISE_FILE, PARAM_TABLES
+
+CARGO_FILE = "combined_country_cargo_per_category.csv"
+
+# Extent of the real noise layer (lon/lat, EPSG:4326)
+BOUNDS = (4.23, 52.04, 5.59, 52.62)
+KM_PER_DEG = (68.0, 111.2)  # lon, lat at 52.3° N
+
+# Runway centre (lon, lat) and heading (degrees from north), in the column order of the file
+RUNWAY_GEOMETRY = {
+    "Lden_Aalsmeerbaan": (4.780, 52.292, 0),
+    "Lden_Buitenveldertbaan": (4.780, 52.318, 90),
+    "Lden_Kaagbaan": (4.739, 52.287, 58),
+    "Lden_Oostbaan": (4.775, 52.302, 41),
+    "Lden_Polderbaan": (4.711, 52.345, 0),
+    "Lden_Zwanenburgbaan": (4.740, 52.315, 0),
+}
+
+# Population centres (lon, lat, relative weight, radius km) for the inhabitant density
+TOWNS = [
+    (4.90, 52.37, 1.0, 6.0),   # Amsterdam
+    (4.64, 52.38, 0.3, 3.5),   # Haarlem
+    (4.49, 52.16, 0.25, 3.5),  # Leiden
+    (4.86, 52.30, 0.2, 3.0),   # Amstelveen
+    (4.69, 52.30, 0.15, 3.0),  # Hoofddorp
+    (4.82, 52.44, 0.2, 3.0),   # Zaandam
+    (5.22, 52.37, 0.3, 5.0),   # Almere
+    (5.12, 52.09, 0.5, 5.0),   # Utrecht
+]
+TOTAL_POPULATION = 3_400_000
+
+# Median €/ton per cargo category (in, out), roughly as in the delivered table
+EUR_PER_TON = {
+    "Fashion_en_textiel": (30, 45),
+    "Industrie_en_materialen": (20, 33),
+    "Low_value_bulk": (8, 15),
+    "Machines_en_elektronica": (100, 130),
+    "Overig": (20, 28),
+    "Perishables": (13, 35),
+    "Pharma": (40, 210),
+    "Transport": (240, 225),
+}
+# Tons per movement (full freight, belly) and yearly cargo movements (in + out)
+TONS_PER_MOVEMENT = (104.0, 9.8)
+TOTAL_MOVEMENTS = 474_000
+
+
+def _rng(seed, stream):
+    # one stream per table, so the noise layer does not change with the number of origins
+    return np.random.default_rng([seed, stream])
+
+
+def _cell_rings(cells, vertices, rng, bounds=BOUNDS, roughness=0.1):
+    """(cells, vertices, 2) closed rings: a grid of boxes over `bounds`, edges split and jittered."""
+    minx, miny, maxx, maxy = bounds
+    aspect = (maxx - minx) * KM_PER_DEG[0] / ((maxy - miny) * KM_PER_DEG[1])
+    nx = max(1, int(round(np.sqrt(cells * aspect))))
+    ny = -(-cells // nx)
+    w, h = (maxx - minx) / nx, (maxy - miny) / ny
+    i = np.arange(cells)
+    x0 = minx + w * (i % nx)
+    y0 = miny + h * (i // nx)
+
+    # points evenly around the box perimeter, t in [0, 4): bottom, right, top, left edge
+    m = max(4, vertices - 1)
+    t = np.arange(m) * 4.0 / m
+    edge, f = np.divmod(t, 1.0)
+    ux = np.select([edge == 0, edge == 1, edge == 2], [f, 1.0, 1.0 - f], 0.0)
+    uy = np.select([edge == 0, edge == 1, edge == 2], [0.0, f, 1.0], 1.0 - f)
+    step = roughness * 4.0 / m
+    ring = np.empty((cells, m + 1, 2))
+    ring[:, :m, 0] = x0[:, None] + w * (ux + rng.uniform(-step, step, (cells, m)))
+    ring[:, :m, 1] = y0[:, None] + h * (uy + rng.uniform(-step, step, (cells, m)))
+    ring[:, m] = ring[:, 0]
+    return ring
+
+
+def synthetic_noise(cells, seed=0, vertices=5, total_population=TOTAL_POPULATION):
+    """
+    A noise layer like geluid_banen: `cells` polygons of `vertices` points (closing point
+    included) over the real extent, with postcode, aantalInwoners and one Lden column per
+    runway. Levels fall off with distance from each runway, stretched along its heading;
+    inhabitants cluster around the main towns and add up to about `total_population`.
+    """
+    rng = _rng(seed, 0)
+    ring = _cell_rings(cells, vertices, rng)
+    geometry = shapely.polygons(ring)
+    lon, lat = ring[:, :-1, 0].mean(axis=1), ring[:, :-1, 1].mean(axis=1)
+
+    data = {"postcode": np.arange(1000, 1000 + cells, dtype=np.int32)}
+    density = np.zeros(cells)
+    for x, y, weight, radius in TOWNS:
+        d2 = ((lon - x) * KM_PER_DEG[0]) ** 2 + ((lat - y) * KM_PER_DEG[1]) ** 2
+        density += weight * np.exp(-d2 / (2 * radius ** 2))
+    density = (density + 0.005) * rng.lognormal(0.0, 0.5, cells)
+    data["aantalInwoners"] = np.floor(total_population * density / density.sum()).astype(np.int32)
+
+    for col, (x, y, heading) in RUNWAY_GEOMETRY.items():
+        dx, dy = (lon - x) * KM_PER_DEG[0], (lat - y) * KM_PER_DEG[1]
+        a = np.radians(heading)
+        along = dx * np.sin(a) + dy * np.cos(a)
+        across = dx * np.cos(a) - dy * np.sin(a)
+        d = np.hypot(along / 3.0, across)
+        level = 65.0 + rng.normal(0.0, 2.0) - 25.0 * np.log10(1.0 + d / 0.5)
+        data[col] = np.maximum(level + rng.normal(0.0, 1.5, cells), 0.0)
+
+    df = pd.DataFrame(data)
+    # same column order as the delivered file
+    df.insert(2, "geometry", geometry)
+    return gpd.GeoDataFrame(df, geometry="geometry", crs="EPSG:4326")
+
+
+def _origin_codes(origins):
+    """Names and ISO 3166 user-assigned codes (XAA..XZZ, cycled) for synthetic origins."""
+    letters = [chr(c) for c in range(ord("A"), ord("Z") + 1)]
+    codes = [f"X{a}{b}" for a in letters for b in letters]
+    return [f"Origin {i + 1:05d}" for i in range(origins)], [codes[i % len(codes)] for i in range(origins)]
+
+
+def synthetic_cargo(origins, seed=0, total_movements=TOTAL_MOVEMENTS, countries=None):
+    """
+    A cargo table in the schema of combined_country_cargo_per_category.csv with `origins`
+    rows. Movements are heavy-tailed over origins (about 40 % with full freighters); the
+    category fractions per direction add up to 1, and the €/ton of a category is missing
+    where its fraction is 0, as in the delivered table.
+
+    `countries` optionally gives (country, iso3) rows to cycle through, so the origins
+    show up on the cargo map; by default they get synthetic names and codes.
+    """
+    rng = _rng(seed, 1)
+    if countries is None:
+        names, iso3 = _origin_codes(origins)
+    else:
+        countries = pd.DataFrame(countries, columns=["country", "iso3"])
+        idx = np.arange(origins) % len(countries)
+        rounds = np.arange(origins) // len(countries)
+        names = [c if r == 0 else f"{c} {r + 1}" for c, r in zip(countries["country"].to_numpy()[idx], rounds)]
+        iso3 = countries["iso3"].to_numpy()[idx]
+
+    weight = rng.lognormal(0.0, 1.5, origins)
+    arrivals = total_movements / 2 * weight / weight.sum()
+    departures = arrivals * rng.uniform(0.9, 1.1, origins)
+    freight_share = np.where(rng.random(origins) < 0.4, rng.beta(2.0, 16.0, origins), 0.0)
+
+    df = pd.DataFrame({"country": names, "iso3": iso3})
+    moves = {}
+    for d, total in enumerate((arrivals, departures)):
+        freight = np.round(total * freight_share)
+        belly = np.round(total) - freight
+        moves[d] = (freight, belly)
+    df["Arrivals total"] = (moves[0][0] + moves[0][1]).astype(np.int64)
+    df["Departures total"] = (moves[1][0] + moves[1][1]).astype(np.int64)
+    for d in range(2):
+        for f in range(2):
+            df[MOVEMENT_COLS[d][f]] = moves[d][f].astype(np.int64)
+    for d in range(2):
+        for f in range(2):
+            per_move = TONS_PER_MOVEMENT[f] * rng.lognormal(0.0, 0.2, origins)
+            df[TON_COLS[d][f]] = np.round(moves[d][f] * per_move, 1)
+    df = df[["country", "iso3", "Arrivals total", "Departures total",
+             "Arrivals full-freight", "Departures full-freight", "Arrivals belly", "Departures belly",
+             "Cargo-in full freight (tons)", "Cargo-out full freight (tons)",
+             "Cargo-in belly (tons)", "Cargo-out belly (tons)"]]
+
+    prefixes = sorted(p for p in CARGO_CATEGORIES.values() if p is not None)
+    fractions = {}
+    for direction in ("in", "out"):
+        frac = rng.dirichlet(np.full(len(prefixes), 0.6), origins)
+        frac[frac < 0.002] = 0.0
+        frac /= frac.sum(axis=1, keepdims=True)
+        for j, p in enumerate(prefixes):
+            fractions[p, direction] = frac[:, j]
+            df[f"{p}_fraction_{direction}"] = frac[:, j]
+    for p in prefixes:
+        for j, direction in enumerate(("in", "out")):
+            price = EUR_PER_TON[p][j] * rng.lognormal(0.0, 0.6, origins)
+            df[f"{p}_eur_per_ton_{direction}"] = np.where(fractions[p, direction] > 0, price, np.nan)
+    return df
+
+
+def synthetic_data_dir(path, cells, origins, seed=0, vertices=5, params_from=DATA_DIR, countries=None):
+    """
+    Write a complete data directory for MAINPORT_DATA_DIR: synthetic noise layer and cargo
+    table, plus the parameter tables copied from `params_from`. Same seed, same files.
+    """
+    os.makedirs(path, exist_ok=True)
+    synthetic_noise(cells, seed, vertices).to_feather(os.path.join(path, NOISE_FILE))
+    synthetic_cargo(origins, seed, countries=countries).to_csv(os.path.join(path, CARGO_FILE), index=False)
+    for fname, _ in PARAM_TABLES.values():
+        shutil.copyfile(os.path.join(params_from, fname), os.path.join(path, fname))
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate a synthetic data directory (noise layer and cargo table) for scaling tests.")
+    parser.add_argument("path", help="output data directory")
+    parser.add_argument("--cells", type=int, default=60_000, help="noise cells")
+    parser.add_argument("--origins", type=int, default=1_000, help="cargo origins")
+    parser.add_argument("--vertices", type=int, default=5, help="points per cell polygon (5: boxes)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--params-from", default=DATA_DIR, help="data directory to copy the parameter tables from")
+    parser.add_argument("--real-countries", action="store_true",
+                        help="cycle the countries of the delivered cargo table instead of synthetic origins")
+    args = parser.parse_args()
+
+    countries = None
+    if args.real_countries:
+        countries = pd.read_csv(os.path.join(args.params_from, CARGO_FILE), usecols=["country", "iso3"])
+    synthetic_data_dir(args.path, args.cells, args.origins, args.seed, args.vertices, args.params_from, countries)
+    print(f"Wrote {args.path}: {args.cells:,} cells × {args.vertices} points, {args.origins:,} cargo origins (seed {args.seed})")
@@ -0,0 +1,70 @@
+import os
+import shutil
+import sys
+
+import pandas as pd
+import pytest
+import shapely
+from pyarrow import feather
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datasets import (DATA_DIR, GEOMETRY_TOLERANCES, NOISE_FILE, NOISE_PYRAMID, PARAM_TABLES, PARAMS_BUNDLE,
+                      PYRAMID_HASH_KEY, _write_arrow, compile_params, compile_pyramid, load_params,
+                      load_pyramid, pyramid_hash)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for fname, _ in PARAM_TABLES.values():
+        shutil.copy(os.path.join(DATA_DIR, fname), tmp_path)
+    return str(tmp_path)
+
+
+def test_compiled_params_match_sources(data_dir):
+    compiled = compile_params(data_dir)
+    loaded = load_params(data_dir)
+    for name in PARAM_TABLES:
+        pd.testing.assert_frame_equal(loaded[name], compiled[name])
+    assert not [f for f in os.listdir(data_dir) if f.endswith(".tmp")]
+
+
+def test_unreadable_params_are_recompiled(data_dir):
+    compiled = compile_params(data_dir)
+    path = os.path.join(data_dir, PARAMS_BUNDLE.format("haul_dist"))
+    with open(path, "wb") as f:
+        f.write(b"not an arrow file")
+    pd.testing.assert_frame_equal(load_params(data_dir)["haul_dist"], compiled["haul_dist"])
+    pd.testing.assert_frame_equal(load_params(data_dir)["haul_dist"], compiled["haul_dist"])
+
+
+def test_params_without_sources_are_used_as_is(data_dir):
+    compiled = compile_params(data_dir)
+    for fname, _ in PARAM_TABLES.values():
+        os.remove(os.path.join(data_dir, fname))
+    loaded = load_params(data_dir)
+    for name in PARAM_TABLES:
+        pd.testing.assert_frame_equal(loaded[name], compiled[name])
+
+
+def test_pyramid_is_compiled_once_and_loaded(tmp_path):
+    shutil.copy(os.path.join(DATA_DIR, NOISE_FILE), tmp_path)
+    compiled = compile_pyramid(str(tmp_path))
+    assert sorted(compiled) == sorted(GEOMETRY_TOLERANCES[1:])
+    mtime = os.path.getmtime(os.path.join(tmp_path, NOISE_PYRAMID))
+    loaded = load_pyramid(str(tmp_path))
+    assert os.path.getmtime(os.path.join(tmp_path, NOISE_PYRAMID)) == mtime
+    for tol, geoms in compiled.items():
+        assert shapely.equals_exact(loaded[tol], geoms).all()
+
+
+def test_stale_pyramid_is_recompiled(tmp_path):
+    shutil.copy(os.path.join(DATA_DIR, NOISE_FILE), tmp_path)
+    compiled = compile_pyramid(str(tmp_path))
+    path = os.path.join(tmp_path, NOISE_PYRAMID)
+    # a pyramid compiled from another layer
+    _write_arrow(feather.read_table(path), path, source_hash="0" * 64)
+    loaded = load_pyramid(str(tmp_path))
+    assert feather.read_table(path).schema.metadata[PYRAMID_HASH_KEY] == pyramid_hash(str(tmp_path)).encode()
+    for tol, geoms in compiled.items():
+        assert shapely.equals_exact(loaded[tol], geoms).all()
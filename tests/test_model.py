@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datasets import get_datasets
+from model import evaluate, evaluate_batch
+
+KPIS = ["va_direct", "va_indirect", "jobs_direct", "jobs_indirect", "total_cargo_freight",
+        "total_cargo_belly", "total_pax", "netwerkbreedte", "netwerkdiepte",
+        "pop_above45", "pop_above50", "homes"]
+
+
+@pytest.mark.parametrize("slots, freight_pct, short_pct, medium_pct", [
+    (500_000, 6.5, 40, 35),
+    (412_345.6, 12.7, 38.4, 33.6),
+    (478_000, 5.0, 40, 35),
+])
+def test_batch_matches_dashboard_evaluate(slots, freight_pct, short_pct, medium_pct):
+    ds = get_datasets()
+    one = evaluate(slots, freight_pct, short_pct, medium_pct, 100 - short_pct - medium_pct, ds=ds, cache=False)
+    table = pd.DataFrame(dict(slots=[slots], freight_pct=[freight_pct], short_pct=[short_pct], medium_pct=[medium_pct]))
+    batch = evaluate_batch(table, ds=ds).iloc[0]
+    for k in KPIS:
+        assert batch[k] == pytest.approx(one[k], rel=1e-9), k
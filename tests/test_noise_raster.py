@@ -0,0 +1,29 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from noise_raster import colour_scale
+
+COLOURS = [(0, 128, 0), (255, 255, 0), (255, 0, 0)]
+
+
+def test_constant_diff_gets_the_midpoint_colour():
+    rgba, zmin, zmax = colour_scale(np.zeros(3), COLOURS, zmid=0)
+    assert (rgba[:, :3] == COLOURS[1]).all()
+    assert (zmin, zmax) == (-0.5, 0.5)
+
+
+def test_constant_levels_get_the_middle_colour():
+    rgba, zmin, zmax = colour_scale(np.full(4, 60.0), COLOURS)
+    assert (rgba[:, :3] == COLOURS[1]).all()
+    assert zmin < 60.0 < zmax
+
+
+def test_scale_ends_and_missing_values():
+    rgba, zmin, zmax = colour_scale(np.array([-2.0, 0.0, 1.0, np.nan]), COLOURS, zmid=0)
+    assert (zmin, zmax) == (-2.0, 2.0)
+    assert tuple(rgba[0, :3]) == COLOURS[0] and tuple(rgba[1, :3]) == COLOURS[1]
+    assert rgba[3, 3] == 0
@@ -0,0 +1,90 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datasets import get_datasets
+from model import evaluate
+from noise_engine import RUNWAYS
+from sweep import SORTED_INDEX_MIN, sweep
+
+KPIS = ["va_direct", "va_indirect", "jobs_direct", "jobs_indirect", "total_cargo_freight",
+        "total_cargo_belly", "total_pax", "netwerkbreedte", "netwerkdiepte",
+        "pop_above45", "pop_above50", "homes"]
+
+
+@pytest.fixture(scope="module")
+def ds():
+    return get_datasets()
+
+
+def random_scenarios(n_allocations, per_allocation, seed=0):
+    rng = np.random.default_rng(seed)
+    shares = np.repeat(rng.random((n_allocations, len(RUNWAYS))), per_allocation, axis=0)
+    df = pd.DataFrame(shares, columns=RUNWAYS)
+    n = len(df)
+    df["slots"] = rng.integers(200_000, 900_001, n)
+    df["freight_pct"] = rng.integers(0, 31, n)
+    df["short_pct"] = rng.integers(10, 61, n)
+    df["medium_pct"] = rng.integers(10, 91, n).clip(max=100 - df["short_pct"])
+    return df
+
+
+def expected(df, ds):
+    rows = []
+    for r in df.itertuples(index=False):
+        d = r._asdict()
+        long_pct = 100 - d["short_pct"] - d["medium_pct"]
+        out = evaluate(d["slots"], d["freight_pct"], d["short_pct"], d["medium_pct"], long_pct,
+                       runway_shares={k: d[k] for k in RUNWAYS}, ds=ds, cache=False)
+        rows.append({k: out[k] for k in KPIS})
+    return pd.DataFrame(rows)
+
+
+@pytest.mark.parametrize("per_allocation", [1, 3, SORTED_INDEX_MIN + 2])
+def test_sweep_matches_evaluate(ds, per_allocation):
+    df = random_scenarios(12, per_allocation)
+    out = sweep(df, ds=ds).reset_index(drop=True)
+    pd.testing.assert_frame_equal(out[KPIS], expected(df, ds), check_dtype=False, rtol=1e-9)
+
+
+def test_sweep_blocks_do_not_change_results(ds):
+    df = random_scenarios(40, 2, seed=1)
+    full = sweep(df, ds=ds)
+    # a few cells × columns per block: many allocation chunks and masked slices
+    blocked = sweep(df, ds=ds, block_bytes=8 * len(ds.population) * 3)
+    pd.testing.assert_frame_equal(blocked[KPIS], full[KPIS])
+
+
+def test_parallel_chunks_keep_proportional_allocations_together(ds):
+    from parallel import ParallelSweep
+    df = random_scenarios(6, 4, seed=2)
+    # the same allocations once more, scaled: same normalised shares, same field
+    scaled = df.copy()
+    scaled[RUNWAYS] *= 2
+    both = pd.concat([df, scaled], ignore_index=True)
+    chunks = []
+    with ParallelSweep(ds, workers=2) as ex:
+        ex._pool.map = lambda fn, parts, refs: [chunks.append(p) or sweep(p, ds=ds, reference=r)
+                                                 for p, r in zip(parts, refs)]
+        out = ex.sweep(both, chunks_per_worker=3)
+    pd.testing.assert_frame_equal(out[KPIS], sweep(both, ds=ds)[KPIS])
+    keys = [set(map(tuple, (p[RUNWAYS] / p[RUNWAYS].to_numpy().sum(axis=1, keepdims=True)).round(9).to_numpy()))
+            for p in chunks]
+    assert all(not (a & b) for i, a in enumerate(keys) for b in keys[i + 1:])
+
+
+def test_parallel_sweep_matches_sweep(ds):
+    from parallel import ParallelSweep
+    df = random_scenarios(8, 3, seed=3)
+    reference = ds.normal - 0.5
+    # real worker processes on the shared-memory arrays
+    with ParallelSweep(ds, workers=2) as ex:
+        assert os.getpid() not in ex.warm()
+        out = ex.sweep(df, reference=reference)
+    expected_out = sweep(df, ds=ds, reference=reference)
+    pd.testing.assert_frame_equal(out, expected_out)
@@ -0,0 +1,115 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# MAINPORT_TIMING_LOG: file the timing of every rerun is appended to as one JSON line
+# ("-" for stderr); unset, nothing is written
+TIMING_LOG = os.environ.get("MAINPORT_TIMING_LOG")
+# MAINPORT_TIMING_BYTES: also log the payload size of sent charts; costs one more
+# serialisation per chart, so off by default
+TIMING_BYTES = os.environ.get("MAINPORT_TIMING_BYTES", "") not in ("", "0")
+
+# Recording of the run in progress on this thread (each script run has its own thread)
+_current = contextvars.ContextVar("timing_run", default=None)
+_log_lock = threading.Lock()
+
+
+class Run:
+    """Spans recorded during one script or fragment run, in the order they started."""
+
+    def __init__(self, name, log=None, **fields):
+        self.name = name
+        self.log = log
+        self.fields = fields
+        self.spans = []
+        self.depth = 0
+        self.time = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+        self._start = time.perf_counter()
+        self.ms = None
+
+    def elapsed_ms(self):
+        return 1000 * (time.perf_counter() - self._start)
+
+    def record(self):
+        return dict(time=self.time, run=self.name, ms=self.ms, **self.fields, spans=self.spans)
+
+
+def current_run():
+    return _current.get()
+
+
+def begin(name, log=TIMING_LOG, **fields):
+    """
+    Start recording a script run on this thread. A run still open here was cut short
+    (st.rerun, st.stop, an exception): it is ended first, marked interrupted.
+    """
+    stale = _current.get()
+    if stale is not None:
+        stale.fields["interrupted"] = True
+        end()
+    r = Run(name, log, **fields)
+    _current.set(r)
+    return r
+
+
+def end():
+    """Finish the run of this thread and append it to its log as a JSON line; returns it."""
+    r = _current.get()
+    if r is None:
+        return None
+    _current.set(None)
+    r.ms = r.elapsed_ms()
+    if r.log:
+        write_json_line(r.record(), r.log)
+    return r
+
+
+@contextmanager
+def run(name, log=TIMING_LOG, **fields):
+    """begin() / end() around a block; inside another run this is just a span (no fields)."""
+    if _current.get() is not None:
+        with span(name):
+            yield _current.get()
+        return
+    r = begin(name, log, **fields)
+    try:
+        yield r
+    finally:
+        if _current.get() is r:
+            end()
+
+
+@contextmanager
+def span(name, **fields):
+    """
+    Time the block as a span of the current run. Yields the span's dict, so the block can
+    add fields (e.g. bytes); outside a run nothing is recorded.
+    """
+    r = _current.get()
+    if r is None:
+        yield {}
+        return
+    rec = dict(name=name, depth=r.depth, ms=None, **fields)
+    r.spans.append(rec)
+    r.depth += 1
+    t = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        rec["ms"] = 1000 * (time.perf_counter() - t)
+        r.depth -= 1
+
+
+def write_json_line(record, path):
+    line = json.dumps(record, default=float) + "\n"
+    with _log_lock:
+        if path == "-":
+            sys.stderr.write(line)
+        else:
+            with open(path, "a") as f:
+                f.write(line)